@@ -1,26 +1,17 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from webdriver_manager.chrome import ChromeDriverManager
-import csv
-import time
+from run_button_pool import RUN_BUTTON, process_artworks_pooled
+from http_client import backoff_sleep
+import argparse
 
-# Set up Chrome WebDriver options
-options = webdriver.ChromeOptions()
-options.add_argument("--disable-gpu")  # Disable GPU acceleration
-options.add_argument("--no-sandbox")  # Disable sandboxing
-options.add_argument("--disable-dev-shm-usage")  # To prevent errors in resource-constrained environments
-options.add_argument("--enable-unsafe-swiftshader")  # Enable SwiftShader for better WebGL handling
-# options.add_argument("--headless")  # Uncomment if you want to run in headless mode (no browser UI)
-
-# Initialize WebDriver
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+# Extra Chrome options on top of the pool defaults
+CHROME_ARGS = [
+    "--enable-unsafe-swiftshader",  # Enable SwiftShader for better WebGL handling
+]
 
 # Function to check for the "Run" button on the page
-def check_run_button(artwork_url, retries=3):
+def check_run_button(driver, artwork_url, retries=3):
     for attempt in range(retries):
         try:
             driver.get(artwork_url)
@@ -28,11 +19,13 @@ def check_run_button(artwork_url, retries=3):
             
             # Scroll down the page in case the button is rendered dynamically
             driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)  # Allow the page to load after scrolling
+            WebDriverWait(driver, 10).until(
+                lambda d: d.execute_script("return document.readyState") == "complete"
+            )
 
             # Wait up to 120 seconds for the "Run" button to be visible
             run_button = WebDriverWait(driver, 120).until(
-                EC.presence_of_element_located((By.XPATH, "//button[contains(text(), 'Run')]"))
+                EC.presence_of_element_located(RUN_BUTTON)
             )
             
             # If found, return success
@@ -45,9 +38,9 @@ def check_run_button(artwork_url, retries=3):
         except NoSuchElementException:
             print(f"No 'Run' button found on {artwork_url}, attempt {attempt + 1}")
         
-        # Retry mechanism if failure
+        # Retry mechanism if failure, with a jittered exponential backoff
         if attempt < retries - 1:
-            time.sleep(5)  # Increased delay before retrying
+            backoff_sleep(attempt, base=2.0)
             print(f"Retrying {artwork_url} (Attempt {attempt + 2}/{retries})")
         else:
             print(f"Failed after {retries} attempts for {artwork_url}")
@@ -55,18 +48,13 @@ def check_run_button(artwork_url, retries=3):
     
     return "Failed after multiple retries"
 
-# Main function to process multiple artworks
-def process_artworks(artwork_urls):
-    results = []
-    for url in artwork_urls:
-        result = check_run_button(url)
-        results.append((url, result))
-    
-    # Write results to a CSV file
-    with open('artwork_button_check_results.csv', mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(["Artwork URL", "Status"])
-        writer.writerows(results)
+# Main function to process multiple artworks across a pool of headless drivers
+def process_artworks(artwork_urls, workers=4, pages_per_driver=25, headless=True, precheck=True,
+                     output='artwork_button_check_results.csv'):
+    process_artworks_pooled(
+        artwork_urls, check_run_button, output=output,
+        workers=workers, pages_per_driver=pages_per_driver, headless=headless, precheck=precheck, extra_args=CHROME_ARGS,
+    )
 
 # List of artwork URLs to check (add more URLs as needed)
 artwork_urls = [
@@ -76,8 +64,18 @@ artwork_urls = [
     # Add more URLs here...
 ]
 
-# Start processing the artworks
-process_artworks(artwork_urls)
+if __name__ == "__main__":
+    # "@file" reads URLs one per line, e.g. the .recheck list written by updatedFxhash.py --diff
+    parser = argparse.ArgumentParser(description="Check fxhash artworks for a working Run button",
+                                     fromfile_prefix_chars="@")
+    parser.add_argument("urls", nargs="*", default=artwork_urls)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--pages-per-driver", type=int, default=25)
+    parser.add_argument("--show-browser", action="store_true", help="run Chrome with a visible window for debugging")
+    parser.add_argument("--no-precheck", action="store_true", help="send every artwork to Selenium")
+    parser.add_argument("--output", default="artwork_button_check_results.csv")
+    args = parser.parse_args()
 
-# Close the WebDriver when done
-driver.quit()
+    # Start processing the artworks
+    process_artworks(args.urls, args.workers, args.pages_per_driver, headless=not args.show_browser,
+                     precheck=not args.no_precheck, output=args.output)
@@ -0,0 +1,219 @@
+# Dependency graph of a generative token's bundle.
+# Starting from the token's index.html, follows <script src>, module preloads and
+# ES-module imports (static and dynamic) that stay inside the token's IPFS or
+# onchfs directory, fetching each level concurrently. Scripts loaded from other origins
+# (CDNs) are fetched as leaves. Every asset is hashed as it streams, and its
+# references and detected libraries are stored once per distinct content, so a
+# p5 build shared by many tokens counts once in the byte totals and its imports are
+# parsed once per run. Each URL is also downloaded at most once per run: results
+# are memoized by (scheme, root CID, path) for content-addressed assets, so any
+# gateway serving the same file shares one entry, and by URL for CDN leaves,
+# which the IPFS cache does not cover. Failed fetches are not memoized.
+# Downloads are streamed with a byte cap and binaries are skipped (see
+# ipfs_cache.Download); only pages and scripts whose references are needed are
+# kept in memory, never the library bundles fetched as leaves.
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from urllib.parse import urldefrag, urljoin, urlparse
+import hashlib
+import json
+import re
+import threading
+
+from lxml import etree
+import requests
+
+from ipfs_cache import Download, parse_content_url
+from library_detector import LibraryScanner
+
+# import x from "./a.js", import "./a.js", export * from "./a.js", import("./a.js")
+IMPORT_PATTERN = re.compile(
+    r"""(?:\bimport\s*(?:[\w$*{}\s,]+?\s*from\s*)?|\bexport\s*[\w$*{}\s,]+?\s*from\s*|\bimport\s*\(\s*)"""
+    r"""(["'`])([^"'`\n]{1,500})\1"""
+)
+
+DEFAULT_MAX_ASSETS = 200
+
+
+# Function to make sure relative script paths resolve inside the token's directory
+def directory_url(url):
+    parsed = urlparse(url)
+    last_segment = parsed.path.rsplit("/", 1)[-1]
+    if parsed.path.endswith("/") or "." in last_segment:
+        return url
+    return parsed._replace(path=parsed.path + "/").geturl()
+
+
+# Function to tell an HTTP 404/410 apart from timeouts and other transient errors
+def is_not_found(error):
+    response = getattr(error, "response", None)
+    return response is not None and response.status_code in (404, 410)
+
+
+# Function to list the module specifiers a script imports
+def script_imports(code):
+    return [match.group(2) for match in IMPORT_PATTERN.finditer(code)]
+
+
+# Function to list the scripts an HTML page loads, including imports in inline modules
+def html_references(html):
+    document = etree.HTML(html)
+    if document is None:
+        return []
+    references = document.xpath("//script[@src]/@src")
+    references += document.xpath("//link[@rel='modulepreload'][@href]/@href")
+    for code in document.xpath("//script[not(@src)][@type='module']/text()"):
+        references += script_imports(code)
+    return references
+
+
+# Function to tell whether a specifier is a path or URL rather than a bare package name
+def is_relative(specifier):
+    return specifier.startswith(("./", "../", "/")) or "://" in specifier
+
+
+class AssetResolver:
+    def __init__(self, workers=8, max_assets=DEFAULT_MAX_ASSETS, timeout=30, max_bytes=None):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.max_assets = max_assets
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        # sha256 -> {"bytes", "references", "scanner"} for every distinct content seen
+        self.contents = {}
+        # (asset key, leaf) -> Future of (sha256, analysis) for every URL requested this run
+        self.memo = {}
+        self.fetched = 0
+        self.reused = 0
+        self.lock = threading.Lock()
+
+    # Function to get an asset's (sha256, analysis), downloading it only the first
+    # time its URL is requested; concurrent requests for it wait on that download
+    # Returns (sha256, analysis), or (None, {"binary": reason}) for skipped binaries;
+    # raises requests.exceptions.RequestException
+    def fetch(self, url, kind):
+        content_key = parse_content_url(url)
+        key = ((content_key[0].name,) + content_key[1:] if content_key is not None else url, kind == "leaf")
+        with self.lock:
+            future = self.memo.get(key)
+            owner = future is None
+            if owner:
+                future = self.memo[key] = Future()
+            else:
+                self.reused += 1
+        if owner:
+            try:
+                future.set_result(self.download(url, kind))
+            except Exception as e:
+                # Let a later token try a failed URL again
+                with self.lock:
+                    del self.memo[key]
+                future.set_exception(e)
+        return future.result()
+
+    # Function to stream one asset, hashing and scanning it chunk by chunk, and find
+    # its references unless the same content was analyzed before
+    def download(self, url, kind):
+        download = Download(url, timeout=self.timeout, max_bytes=self.max_bytes)
+        digest = hashlib.sha256()
+        scanner = LibraryScanner()
+        kept = [] if kind != "leaf" else None
+        for chunk in download.chunks():
+            digest.update(chunk)
+            scanner.feed(chunk)
+            if kept is not None:
+                kept.append(chunk)
+        if download.binary:
+            return None, {"binary": download.binary}
+        scanner.close()
+        digest = digest.hexdigest()
+        with self.lock:
+            self.fetched += 1
+            known = self.contents.get(digest)
+        if known is not None and (kind == "leaf" or known["references"] is not None):
+            return digest, known
+
+        text = b"".join(kept).decode("utf-8", errors="replace") if kept is not None else None
+        if kind == "html":
+            references = html_references(text)
+        elif kind == "script":
+            references = script_imports(text)
+        else:
+            references = None
+        analysis = {"bytes": download.size, "references": references, "truncated": download.truncated,
+                    "scanner": known["scanner"] if known else scanner}
+        with self.lock:
+            self.contents[digest] = analysis
+        return digest, analysis
+
+    # Function to walk a token's bundle from its root HTML
+    # Returns the dependency manifest; raises the root's RequestException if it cannot be fetched
+    def resolve(self, root_url):
+        root_url = directory_url(root_url)
+        scope = parse_content_url(root_url)
+        seen = {root_url}
+        pending = {self.executor.submit(self.fetch, root_url, "html"): (root_url, None)}
+        assets = []
+        digests = set()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                url, parent = pending.pop(future)
+                asset = {"url": url, "parent": parent}
+                assets.append(asset)
+                try:
+                    digest, analysis = future.result()
+                except requests.exceptions.RequestException as e:
+                    if parent is None:
+                        raise
+                    asset["status"] = "missing" if is_not_found(e) else f"error: {e.__class__.__name__}"
+                    continue
+                if digest is None:
+                    asset["status"] = f"skipped: {analysis['binary']}"
+                    continue
+                asset.update(status="truncated" if analysis["truncated"] else "ok", sha256=digest,
+                             bytes=analysis["bytes"], imports=[], unresolved=[])
+                digests.add(digest)
+
+                for specifier in analysis["references"] or []:
+                    if not is_relative(specifier):
+                        asset["unresolved"].append(specifier)
+                        continue
+                    child = urldefrag(urljoin(url, specifier))[0]
+                    if urlparse(child).scheme not in ("http", "https"):
+                        continue
+                    asset["imports"].append(child)
+                    if child in seen or len(seen) >= self.max_assets:
+                        continue
+                    seen.add(child)
+                    key = parse_content_url(child)
+                    inside = scope is not None and key is not None and key[:2] == scope[:2]
+                    pending[self.executor.submit(self.fetch, child, "script" if inside else "leaf")] = (child, url)
+
+        scanner = LibraryScanner()
+        for digest in digests:
+            scanner.merge(self.contents[digest]["scanner"])
+        p5_versions, other_libraries = scanner.summary()
+        return {
+            "root": root_url,
+            "assets": assets,
+            "unique_bytes": sum(self.contents[digest]["bytes"] for digest in digests),
+            "truncated": len(seen) >= self.max_assets,
+            "p5_versions": p5_versions,
+            "other_libraries": other_libraries,
+        }
+
+    # Function to report how many downloads the URL memo and content hashing saved
+    def stats(self):
+        with self.lock:
+            return {"fetched": self.fetched, "reused": self.reused, "distinct": len(self.contents),
+                    "bytes": sum(c["bytes"] for c in self.contents.values())}
+
+    def close(self):
+        self.executor.shutdown()
+
+
+# Function to append one token's manifest to a JSON-lines file
+def write_manifest(path, token_id, manifest):
+    with open(path, mode='a', encoding='utf-8') as file:
+        file.write(json.dumps(dict(manifest, token_id=token_id)) + "\n")
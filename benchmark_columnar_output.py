@@ -0,0 +1,60 @@
+# Benchmark: CSV vs partitioned Parquet for the artwork analysis output.
+# Converts an existing crawl CSV to Parquet and compares on-disk size, full load
+# time, and the time to load just the columns a typical analysis needs.
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from columnar_output import csv_to_parquet, read_parquet
+
+
+# Function to total the size of a file or directory tree in bytes
+def disk_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names
+    )
+
+
+# Function to time a callable, best of `repeat` runs
+def timed(func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare CSV and Parquet output size and load time")
+    parser.add_argument("--csv", default="fxhash_artwork_analysis.csv")
+    parser.add_argument("--start-id", type=int, default=30661)
+    args = parser.parse_args()
+
+    out_dir = tempfile.mkdtemp(prefix="fxhash_parquet_")
+    try:
+        csv_to_parquet(args.csv, out_dir, start_id=args.start_id)
+
+        columns = ["artwork_id", "link_status", "p5_versions"]
+        csv_columns = ["Link Status", "p5.js Versions"]
+        print(f"{'':24}{'CSV':>12}{'Parquet':>12}")
+        print(f"{'size (KB)':24}{disk_size(args.csv) / 1024:12.1f}{disk_size(out_dir) / 1024:12.1f}")
+        full_csv = timed(lambda: pd.read_csv(args.csv, keep_default_na=False))
+        full_parquet = timed(lambda: read_parquet(out_dir))
+        print(f"{'full load (ms)':24}{full_csv * 1000:12.1f}{full_parquet * 1000:12.1f}")
+        some_csv = timed(lambda: pd.read_csv(args.csv, keep_default_na=False, usecols=csv_columns))
+        some_parquet = timed(lambda: read_parquet(out_dir, columns=columns))
+        print(f"{'status+p5 columns (ms)':24}{some_csv * 1000:12.1f}{some_parquet * 1000:12.1f}")
+    finally:
+        shutil.rmtree(out_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Benchmark: single-pass library detector vs the original three-regex extract_libraries.
+# Builds a synthetic minified bundle (lots of semver-looking numbers, a few real
+# library signatures) and reports throughput in MB/s for both implementations,
+# plus the streaming scanner fed in 64 KB chunks.
+
+import argparse
+import random
+import re
+import time
+
+from library_detector import detect_libraries, scan_chunks
+
+
+# The original extract_libraries, kept here as the baseline
+def legacy_extract_libraries(code_content):
+    if not code_content or "Error" in code_content:
+        return "No p5.js found", "No other libraries found"
+
+    p5_versions = re.findall(r'(p5(\.min)?\.js)[^\s]*', code_content)
+    version_numbers = re.findall(r'(v?\d+\.\d+\.\d+|p5@\d+\.\d+\.\d+)', code_content)
+    js_libraries = re.findall(r'(https?://[^"\'\s]+\.js)', code_content)
+
+    p5_version_summary = " / ".join(set(version_numbers)) if version_numbers else "No p5.js found"
+    other_libraries_summary = " / ".join(set(js_libraries)) if js_libraries else "No other libraries found"
+
+    return p5_version_summary, other_libraries_summary
+
+
+# Function to build a synthetic minified bundle of roughly `size_mb` megabytes
+def make_bundle(size_mb, seed=0):
+    rng = random.Random(seed)
+    pieces = [
+        '/*! p5.js v1.4.0 June 29, 2021 */',
+        '<script src="https://cdn.jsdelivr.net/npm/p5@1.4.0/lib/p5.min.js"></script>',
+        'const REVISION="150";',
+    ]
+    size = sum(len(piece) for piece in pieces)
+    target = int(size_mb * 1024 * 1024)
+    while size < target:
+        piece = (
+            f"function _{rng.randrange(10**6):x}(t,e){{return t*{rng.random():.6f}+e.{rng.choice('xyzw')}}}"
+            f"var c{rng.randrange(1000)}=[{rng.randrange(9)}.{rng.randrange(99)}.{rng.randrange(99)},"
+            f"{rng.random():.4f}];"
+        )
+        pieces.append(piece)
+        size += len(piece)
+    return "".join(pieces)
+
+
+# Function to time a callable and return (seconds, result)
+def timed(func, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JavaScript library detection throughput")
+    parser.add_argument("--size-mb", type=float, default=8.0)
+    parser.add_argument("--chunk-kb", type=int, default=64)
+    args = parser.parse_args()
+
+    bundle = make_bundle(args.size_mb)
+    raw = bundle.encode("utf-8")
+    megabytes = len(raw) / (1024 * 1024)
+    chunk = args.chunk_kb * 1024
+    chunks = [raw[i:i + chunk] for i in range(0, len(raw), chunk)]
+
+    runs = [
+        ("legacy (3x re.findall)", legacy_extract_libraries, bundle),
+        ("single pass (str)", detect_libraries, bundle),
+        (f"single pass ({args.chunk_kb} KB chunks)", scan_chunks, chunks),
+    ]
+    print(f"Bundle size: {megabytes:.1f} MB")
+    for name, func, data in runs:
+        seconds, (p5_summary, other_summary) = timed(func, data)
+        print(f"{name:32} {megabytes / seconds:8.1f} MB/s  p5: {p5_summary[:40]!r}  other: {other_summary[:60]!r}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+# Offline end-to-end benchmark suite.
+# Serves fxhash API, fxhash page and IPFS gateway traffic from a local replay
+# server, then runs updatedFxhash.py, merge_codes.py and the Run-button checker as
+# separate processes pointed at it (FXHASH_REPLAY_URL), reporting tokens/sec,
+# peak RSS and request counts for each.
+#
+# Fixtures are either generated from the rows already in
+# fxhash_artwork_analysis.csv and fxhash_data.csv, or recorded from the live
+# services with --record DIR and replayed later with --fixtures DIR. The server
+# can add latency, inject 503 errors and answer 429 (with Retry-After) above a
+# per-host request rate to see how the pipeline copes. It also
+# stands in for the onchfs HTTP proxy, serving the feed's onchfs:// tokens.
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import argparse
+import base64
+import csv
+import hashlib
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+GATEWAY_HOSTS = ("gateway.fxhash2.xyz", "gateway.ipfs.io")
+ONCHFS_HOST = "onchfs.fxhash2.xyz"
+
+
+# Recorded or generated responses, plus the token table GraphQL answers from
+class FixtureStore:
+    def __init__(self):
+        self.responses = {}
+        self.posts = {}
+        self.tokens = {}
+        self.lock = threading.Lock()
+
+    # Function to key a GET by host and path (query strings are ignored)
+    @staticmethod
+    def get_key(host, path):
+        return f"{host}{urlparse(path).path}"
+
+    # Function to key a POST by host, path and body
+    @staticmethod
+    def post_key(host, path, body):
+        return f"{host}{path}#{hashlib.sha1(body).hexdigest()}"
+
+    def add(self, host, path, body, status=200, content_type="text/html; charset=utf-8"):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        with self.lock:
+            self.responses[self.get_key(host, path)] = (status, content_type, body)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        encode = lambda table: {
+            key: [status, content_type, base64.b64encode(body).decode()]
+            for key, (status, content_type, body) in table.items()
+        }
+        with open(os.path.join(directory, "fixtures.json"), mode='w', encoding='utf-8') as file:
+            json.dump({"responses": encode(self.responses), "posts": encode(self.posts),
+                       "tokens": self.tokens}, file)
+
+    @classmethod
+    def load(cls, directory):
+        store = cls()
+        with open(os.path.join(directory, "fixtures.json"), encoding='utf-8') as file:
+            data = json.load(file)
+        decode = lambda table: {
+            key: (status, content_type, base64.b64decode(body))
+            for key, (status, content_type, body) in table.items()
+        }
+        store.responses = decode(data["responses"])
+        store.posts = decode(data["posts"])
+        store.tokens = {int(key): token for key, token in data["tokens"].items()}
+        return store
+
+
+# Function to turn a gateway URL from the CSVs back into an ipfs:// URI
+def to_ipfs_uri(url):
+    match = re.match(r"https?://[^/]+/ipfs/(.+)", url or "")
+    if match:
+        return "ipfs://" + match.group(1)
+    return url if url and url.startswith(("ipfs://", "onchfs://")) else None
+
+
+# Function to get the hosts and directory path serving an ipfs:// or onchfs:// URI
+def bundle_location(uri):
+    scheme, rest = uri.split("://", 1)
+    root = rest.split("/", 1)[0].split("?", 1)[0]
+    if scheme == "onchfs":
+        return (ONCHFS_HOST,), f"/{root}"
+    return GATEWAY_HOSTS, f"/ipfs/{root}"
+
+
+# Function to generate the IPFS / onchfs content of one synthetic generative token
+def add_generative_bundle(store, uri, p5_version, bundle_kb, runnable):
+    hosts, base = bundle_location(uri)
+    sketch = "function setup(){createCanvas(400,400)}function draw(){background(%s)}" % (
+        "fxrand()*255" if runnable else "220"
+    )
+    padding = "var _pad=[%s];" % ",".join(["0.123456"] * max(0, bundle_kb * 1024 // 9))
+    index = '<html><head><script src="./p5.min.js"></script><script src="./sketch.js"></script></head><body></body></html>'
+    for host in hosts:
+        store.add(host, base, index)
+        store.add(host, f"{base}/", index)
+        store.add(host, f"{base}/sketch.js", sketch, content_type="application/javascript")
+        store.add(host, f"{base}/p5.min.js", f"/*! p5.js v{p5_version} */" + padding,
+                  content_type="application/javascript")
+
+
+# Function to build an fxhash artwork page for the scraping fallback and Selenium
+def artwork_page(token):
+    # Compact like the page's real JSON data, which is what updatedFxhash.URI_PATTERN expects
+    data = json.dumps({key: token.get(key) for key in ("generativeUri", "displayUri", "thumbnailUri")},
+                      separators=(",", ":"))
+    description = (token.get("metadata") or {}).get("description", "")
+    return (
+        "<html><body>"
+        f'<div class="Clamp_container__xOFme GenerativeDisplay_description__NweHb">{description}</div>'
+        f"<script>{data}</script><button>Run ▶︎</button>"
+        "</body></html>"
+    )
+
+
+# Function to generate fixtures from the existing analysis and feed CSVs
+# Returns (store, artwork IDs from the analysis CSV)
+def generate_fixtures(analysis_csv, feed_csv, start_id=30661, bundle_kb=64):
+    store = FixtureStore()
+    artwork_ids = []
+
+    with open(analysis_csv, newline='', encoding='utf-8') as file:
+        for index, row in enumerate(csv.DictReader(file)):
+            artwork_id = start_id + index
+            artwork_ids.append(artwork_id)
+            if row["Link Status"] != "working":
+                store.tokens[artwork_id] = None
+                store.add("www.fxhash.xyz", f"/generative/{artwork_id}", "Internal Server Error", status=500)
+                continue
+            generative_uri = to_ipfs_uri(row["Generative URI fxhash"]) or f"ipfs://QmSynthetic{artwork_id}"
+            token = {
+                "id": artwork_id,
+                "name": f"Token {artwork_id}",
+                "generativeUri": generative_uri,
+                "displayUri": to_ipfs_uri(row["Display URI fxhash"]),
+                "thumbnailUri": to_ipfs_uri(row["Thumbnail URI fxhash"]),
+                "metadata": {"description": row["Description"],
+                             "artifactUri": to_ipfs_uri(row["Artifact URI fxhash"])},
+                "author": {"name": "benchmark"},
+                "mintOpensAt": f"2024-01-01T00:00:00.{artwork_id:06d}Z",
+            }
+            store.tokens[artwork_id] = token
+            store.add("www.fxhash.xyz", f"/generative/{artwork_id}", artwork_page(token))
+            version = re.search(r"\d+\.\d+\.\d+", row["p5.js Versions"])
+            # Every fourth token has no fxhash snippet, so the HTTP pre-check escalates it
+            add_generative_bundle(store, generative_uri, version.group() if version else "1.4.0",
+                                  bundle_kb, runnable=index % 4 != 0)
+
+    with open(feed_csv, newline='', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            artwork_id = int(row["Artwork Link"].rsplit("/", 1)[1])
+            uri = row["IPFS Link"]
+            store.tokens[artwork_id] = {
+                "id": artwork_id, "name": row["Description"], "generativeUri": uri, "slug": str(artwork_id),
+                "flag": "CLEAN", "author": {"name": "benchmark"}, "metadata": {},
+                "mintOpensAt": f"2024-06-01T00:00:00.{artwork_id:06d}Z",
+            }
+            if uri.startswith(("ipfs://", "onchfs://")):
+                add_generative_bundle(store, uri, "1.4.0", bundle_kb, runnable=True)
+    return store, artwork_ids
+
+
+# Local HTTP server replaying fixtures at /<host>/<path>
+class ReplayServer:
+    def __init__(self, store, latency_ms=0, jitter_ms=0, error_rate=0.0, record=False, max_rps=None):
+        self.store = store
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.record = record
+        self.max_rps = max_rps
+        self.counts = {}
+        self.errors_injected = 0
+        self.throttled = 0
+        # host -> (start of the current one-second window, requests in it)
+        self.windows = {}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    # Function to take a snapshot of request counts per host and reset them
+    # Returns (counts, injected 503s, 429s sent)
+    def take_counts(self):
+        with self.lock:
+            counts, self.counts = self.counts, {}
+            errors, self.errors_injected = self.errors_injected, 0
+            throttled, self.throttled = self.throttled, 0
+        return counts, errors, throttled
+
+    # Function to count a request against its host's per-second limit, False if over it
+    def within_rate(self, host):
+        if not self.max_rps:
+            return True
+        now = time.monotonic()
+        with self.lock:
+            started, count = self.windows.get(host, (now, 0))
+            if now - started >= 1.0:
+                started, count = now, 0
+            self.windows[host] = (started, count + 1)
+            if count < self.max_rps:
+                return True
+            self.throttled += 1
+            return False
+
+    # Function to answer a GraphQL query from the token table
+    def graphql(self, body):
+        query = json.loads(body)
+        text = query.get("query", "")
+        tokens = self.store.tokens
+        if "generativeTokens(" in text:
+            variables = query.get("variables") or {}
+            field, direction = next(iter((variables.get("sort") or {"mintOpensAt": "DESC"}).items()))
+            ordered = sorted((t for t in tokens.values() if t), key=lambda t: (t.get(field) is not None, t.get(field)),
+                             reverse=direction == "DESC")
+            skip = variables.get("skip") or 0
+            take = variables.get("take") or 20
+            return {"data": {"generativeTokens": ordered[skip:skip + take]}}
+        data = {}
+        for alias, artwork_id in re.findall(r"(\w+): generativeToken\(id: (\d+)\)", text):
+            data[alias] = tokens.get(int(artwork_id))
+        return {"data": data}
+
+    # Function to fetch a response from the live service for --record
+    def fetch_upstream(self, method, host, path, body):
+        response = requests.request(method, f"https://{host}{path}", data=body, timeout=30,
+                                    headers={"Content-Type": "application/json"} if body else {})
+        return response.status_code, response.headers.get("Content-Type", "text/html"), response.content
+
+    def _handler(self):
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Clients stop reading once they hit their byte cap
+                    pass
+
+            def _serve(self, method):
+                _, host, path = self.path.split("/", 2)
+                path = "/" + path
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0)) if method == "POST" else b""
+                with replay.lock:
+                    replay.counts[host] = replay.counts.get(host, 0) + 1
+
+                if not replay.within_rate(host):
+                    self.send_response(429)
+                    self.send_header("Retry-After", "1")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                delay = replay.latency_ms + random.uniform(0, replay.jitter_ms)
+                if delay:
+                    time.sleep(delay / 1000)
+                if replay.error_rate and random.random() < replay.error_rate:
+                    with replay.lock:
+                        replay.errors_injected += 1
+                    return self._respond(503, "text/plain", b"injected error")
+
+                store = replay.store
+                if method == "POST":
+                    key = store.post_key(host, path, body)
+                    if key in store.posts:
+                        return self._respond(*store.posts[key])
+                    if replay.record:
+                        store.posts[key] = replay.fetch_upstream(method, host, path, body)
+                        return self._respond(*store.posts[key])
+                    if path == "/graphql":
+                        return self._respond(200, "application/json", json.dumps(replay.graphql(body)).encode())
+                    return self._respond(404, "text/plain", b"no fixture")
+
+                key = store.get_key(host, path)
+                if key not in store.responses and replay.record:
+                    store.responses[key] = replay.fetch_upstream(method, host, path, None)
+                if key in store.responses:
+                    return self._respond(*store.responses[key])
+                return self._respond(404, "text/plain", b"no fixture")
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+        return Handler
+
+
+# Function to run a script as a child process against the replay server
+# Returns (seconds, peak RSS in MB, exit status)
+def run_script(args, replay_url, workdir):
+    env = dict(os.environ, FXHASH_REPLAY_URL=replay_url, PYTHONPATH=REPO_DIR)
+    started = time.perf_counter()
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen([sys.executable] + args, cwd=workdir, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=stderr)
+        # The child's ru_maxrss also counts this (large) process from before the
+        # exec, so sample the peak of its own address space instead
+        peak_mb = None
+        while True:
+            pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+            if pid:
+                break
+            peak_mb = peak_rss_mb(process.pid) or peak_mb
+            time.sleep(0.05)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        elapsed = time.perf_counter() - started
+        if status:
+            stderr.seek(0)
+            print(stderr.read().decode(errors="replace")[-2000:])
+    # ru_maxrss (kilobytes on Linux) is only used where /proc is not available
+    return elapsed, peak_mb or usage.ru_maxrss / 1024, process.returncode
+
+
+# Function to read a running process's peak resident set size in MB (Linux /proc)
+def peak_rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status", encoding='utf-8') as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+# Function to count the data rows a scenario wrote
+def count_rows(path):
+    if not os.path.exists(path):
+        return 0
+    with open(path, newline='', encoding='utf-8') as file:
+        return max(0, sum(1 for _ in csv.reader(file)) - 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fxhash scripts end-to-end against a local replay server")
+    parser.add_argument("--fixtures", metavar="DIR", help="replay fixtures saved with --record or --save-fixtures")
+    parser.add_argument("--record", metavar="DIR", help="forward misses to the live services and save them to DIR")
+    parser.add_argument("--save-fixtures", metavar="DIR", help="save the generated fixtures to DIR")
+    parser.add_argument("--analysis-csv", default=os.path.join(REPO_DIR, "fxhash_artwork_analysis.csv"))
+    parser.add_argument("--feed-csv", default=os.path.join(REPO_DIR, "fxhash_data.csv"))
+    parser.add_argument("--start-id", type=int, default=30661)
+    parser.add_argument("--limit", type=int, default=200, help="number of artworks to crawl")
+    parser.add_argument("--bundle-kb", type=int, default=64, help="size of each synthetic p5 bundle")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-rps", type=int, help="answer 429 above this many requests per second per host")
+    parser.add_argument("--selenium", action="store_true", help="also run Chrome for escalated Run-button checks")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        store = FixtureStore.load(args.fixtures)
+        artwork_ids = list(range(args.start_id, args.start_id + args.limit))
+    elif args.record:
+        store = FixtureStore()
+        artwork_ids = list(range(args.start_id, args.start_id + args.limit))
+    else:
+        store, artwork_ids = generate_fixtures(args.analysis_csv, args.feed_csv, args.start_id, args.bundle_kb)
+        if args.save_fixtures:
+            store.save(args.save_fixtures)
+    artwork_ids = artwork_ids[:args.limit]
+    start_id, end_id = artwork_ids[0], artwork_ids[-1]
+
+    replay = ReplayServer(store, args.latency_ms, args.jitter_ms, args.error_rate, record=bool(args.record),
+                          max_rps=args.max_rps).start()
+    workdir = tempfile.mkdtemp(prefix="fxhash_bench_")
+    button_urls = [f"{replay.url}/www.fxhash.xyz/generative/{i}" for i in artwork_ids]
+    button_script = ["code_for_button_check.py"] if args.selenium else [
+        "-c", "import sys, run_button_precheck; run_button_precheck.precheck_artworks(sys.argv[1:])"
+    ]
+
+    scenarios = [
+        ("updatedFxhash.main", [os.path.join(REPO_DIR, "updatedFxhash.py"), "--start-id", str(start_id),
+                                "--end-id", str(end_id), "--output", "analysis.csv", "--fresh"],
+         "analysis.csv", len(artwork_ids)),
+        ("merge_codes feed", [os.path.join(REPO_DIR, "merge_codes.py")], "fxhash_data.csv", None),
+        ("run button check", [os.path.join(REPO_DIR, button_script[0])] + button_script[1:] + button_urls
+         if args.selenium else button_script + button_urls,
+         None, len(button_urls)),
+    ]
+
+    print(f"Replay server {replay.url}, workdir {workdir}")
+    print(f"{'scenario':22}{'tokens':>8}{'seconds':>9}{'tokens/s':>10}{'peak MB':>9}{'requests':>10}{'503s':>6}{'429s':>6}  per host")
+    try:
+        for name, script_args, output, tokens in scenarios:
+            seconds, peak_mb, exit_code = run_script(script_args, replay.url, workdir)
+            counts, errors, throttled = replay.take_counts()
+            if output:
+                tokens = count_rows(os.path.join(workdir, output))
+            hosts = ", ".join(f"{host}={count}" for host, count in sorted(counts.items()))
+            failed = "" if exit_code == 0 else f"  (exit {exit_code})"
+            print(f"{name:22}{tokens:8d}{seconds:9.2f}{tokens / seconds:10.1f}{peak_mb:9.1f}"
+                  f"{sum(counts.values()):10d}{errors:6d}{throttled:6d}  {hosts}{failed}")
+    finally:
+        replay.stop()
+        if args.record:
+            store.save(args.record)
+
+
+if __name__ == "__main__":
+    main()
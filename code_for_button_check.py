@@ -1,26 +1,12 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from webdriver_manager.chrome import ChromeDriverManager
-import csv
-import time
-
-# Set up Chrome WebDriver options
-options = webdriver.ChromeOptions()
-# Comment out the headless mode for debugging
-# options.add_argument("--headless")  
-options.add_argument("--disable-gpu")
-options.add_argument("--no-sandbox")
-options.add_argument("--disable-dev-shm-usage")
-
-# Initialize WebDriver
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+from run_button_pool import RUN_BUTTON, process_artworks_pooled
+from http_client import backoff_sleep
+import argparse
 
 # Function to check for the "Run" button on the page
-def check_run_button(artwork_url, retries=3):
+def check_run_button(driver, artwork_url, retries=3):
     for attempt in range(retries):
         try:
             driver.get(artwork_url)
@@ -28,7 +14,7 @@ def check_run_button(artwork_url, retries=3):
             
             # Wait up to 60 seconds for the "Run" button to be visible
             run_button = WebDriverWait(driver, 60).until(
-                EC.presence_of_element_located((By.XPATH, "//button[contains(text(), 'Run')]"))
+                EC.presence_of_element_located(RUN_BUTTON)
             )
             
             # If found, return success
@@ -40,9 +26,9 @@ def check_run_button(artwork_url, retries=3):
         except NoSuchElementException:
             print(f"No 'Run' button found on {artwork_url}, attempt {attempt + 1}")
         
-        # Retry mechanism if failure
+        # Retry mechanism if failure, with a jittered exponential backoff
         if attempt < retries - 1:
-            time.sleep(5)  # Increased delay before retrying
+            backoff_sleep(attempt, base=2.0)
             print(f"Retrying {artwork_url} (Attempt {attempt + 2}/{retries})")
         else:
             print(f"Failed after {retries} attempts for {artwork_url}")
@@ -50,18 +36,13 @@ def check_run_button(artwork_url, retries=3):
     
     return "Failed after multiple retries"
 
-# Main function to process multiple artworks
-def process_artworks(artwork_urls):
-    results = []
-    for url in artwork_urls:
-        result = check_run_button(url)
-        results.append((url, result))
-    
-    # Write results to a CSV file
-    with open('artwork_button_check_results.csv', mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(["Artwork URL", "Status"])
-        writer.writerows(results)
+# Main function to process multiple artworks across a pool of headless drivers
+def process_artworks(artwork_urls, workers=4, pages_per_driver=25, headless=True, precheck=True,
+                     output='artwork_button_check_results.csv'):
+    process_artworks_pooled(
+        artwork_urls, check_run_button, output=output,
+        workers=workers, pages_per_driver=pages_per_driver, headless=headless, precheck=precheck,
+    )
 
 # List of artwork URLs to check (add more URLs as needed)
 artwork_urls = [
@@ -71,8 +52,18 @@ artwork_urls = [
     # Add more URLs here...
 ]
 
-# Start processing the artworks
-process_artworks(artwork_urls)
+if __name__ == "__main__":
+    # "@file" reads URLs one per line, e.g. the .recheck list written by updatedFxhash.py --diff
+    parser = argparse.ArgumentParser(description="Check fxhash artworks for a working Run button",
+                                     fromfile_prefix_chars="@")
+    parser.add_argument("urls", nargs="*", default=artwork_urls)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--pages-per-driver", type=int, default=25)
+    parser.add_argument("--show-browser", action="store_true", help="run Chrome with a visible window for debugging")
+    parser.add_argument("--no-precheck", action="store_true", help="send every artwork to Selenium")
+    parser.add_argument("--output", default="artwork_button_check_results.csv")
+    args = parser.parse_args()
 
-# Close the WebDriver when done
-driver.quit()
+    # Start processing the artworks
+    process_artworks(args.urls, args.workers, args.pages_per_driver, headless=not args.show_browser,
+                     precheck=not args.no_precheck, output=args.output)
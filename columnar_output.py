@@ -0,0 +1,116 @@
+# Columnar (Parquet) output for the artwork analysis.
+# The CSV repeats every URI twice as full gateway URLs; here each URI is stored
+# once in its compact ipfs:// (or onchfs://) form and the gateway columns are rebuilt on load.
+# Status and library columns are dictionary-encoded, and files are partitioned
+# by artwork ID range so a slice of the crawl can be read without the rest.
+
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from updatedFxhash import CSV_COLUMNS, ipfs_to_http
+from crawl_checkpoint import read_rows
+
+PARTITION_SIZE = 1000
+
+# (column prefix in the CSV, compact column name in Parquet)
+URI_COLUMNS = [
+    ("Artifact URI", "artifact_uri"),
+    ("Display URI", "display_uri"),
+    ("Thumbnail URI", "thumbnail_uri"),
+    ("Generative URI", "generative_uri"),
+]
+
+# Plain CSV columns and their Parquet names; the first three are dictionary-encoded
+VALUE_COLUMNS = [
+    ("Link Status", "link_status"),
+    ("p5.js Versions", "p5_versions"),
+    ("Other JS Libraries", "other_libraries"),
+    ("Description", "description"),
+    ("IPFS Link", "ipfs_link"),
+]
+DICTIONARY_COLUMNS = {"link_status", "p5_versions", "other_libraries"}
+
+
+# Function to turn the (HTTP, fxhash) gateway URL pair back into the URI they came from
+def compact_uri(http_url, fxhash_url):
+    for scheme in ("ipfs://", "onchfs://"):
+        http_prefix, fxhash_prefix = ipfs_to_http(scheme)
+        if http_url.startswith(http_prefix) and fxhash_url == fxhash_prefix + http_url[len(http_prefix):]:
+            return scheme + http_url[len(http_prefix):]
+    if http_url == fxhash_url:
+        return http_url
+    raise ValueError(f"URI pair is not derived from one URI: {http_url!r}, {fxhash_url!r}")
+
+
+# Function to build an Arrow table from artwork IDs and a DataFrame in the CSV schema
+def frame_to_table(artwork_ids, df, partition_size=PARTITION_SIZE):
+    columns = {
+        "artwork_id": pa.array(artwork_ids, type=pa.int64()),
+        "id_bucket": pa.array([i // partition_size * partition_size for i in artwork_ids], type=pa.int64()),
+    }
+    for csv_name, name in VALUE_COLUMNS:
+        values = pa.array(df[csv_name].astype(str).tolist(), type=pa.string())
+        columns[name] = values.dictionary_encode() if name in DICTIONARY_COLUMNS else values
+    for prefix, name in URI_COLUMNS:
+        columns[name] = pa.array(
+            [compact_uri(h, f) for h, f in zip(df[prefix + " HTTP"], df[prefix + " fxhash"])], type=pa.string()
+        )
+    return pa.table(columns)
+
+
+# Function to rebuild the CSV schema (same columns and order) from a Parquet frame
+def table_to_frame(df):
+    out = pd.DataFrame(index=df.index)
+    values = dict(VALUE_COLUMNS)
+    uris = dict(URI_COLUMNS)
+    for column in CSV_COLUMNS:
+        if column in values:
+            out[column] = df[values[column]].astype(str)
+            continue
+        prefix, gateway = column.rsplit(" ", 1)
+        pairs = [ipfs_to_http(uri) for uri in df[uris[prefix]]]
+        out[column] = [pair[0] if gateway == "HTTP" else pair[1] for pair in pairs]
+    return out
+
+
+# Function to write rows to a Parquet dataset partitioned by ID range
+# Partitions touched by this write are replaced, others are left alone
+def write_parquet(artwork_ids, df, out_dir, partition_size=PARTITION_SIZE):
+    table = frame_to_table(artwork_ids, df, partition_size)
+    ds.write_dataset(
+        table, out_dir, format="parquet",
+        partitioning=ds.partitioning(pa.schema([("id_bucket", pa.int64())]), flavor="hive"),
+        existing_data_behavior="delete_matching",
+    )
+
+
+# Function to convert a crawl CSV into a Parquet dataset
+# IDs come from the checkpoint manifest, or count up from start_id if there is none
+def csv_to_parquet(csv_path, out_dir, start_id=None, partition_size=PARTITION_SIZE):
+    pairs = list(read_rows(csv_path, CSV_COLUMNS, start_id))
+    artwork_ids = [artwork_id for artwork_id, _ in pairs]
+    df = pd.DataFrame([row for _, row in pairs], columns=CSV_COLUMNS, dtype=str)
+    write_parquet(artwork_ids, df, out_dir, partition_size)
+
+
+# Function to load selected Parquet columns, optionally only for an ID range
+def read_parquet(out_dir, columns=None, start_id=None, end_id=None):
+    dataset = ds.dataset(out_dir, format="parquet", partitioning="hive")
+    condition = None
+    if start_id is not None:
+        condition = ds.field("artwork_id") >= start_id
+    if end_id is not None:
+        upper = ds.field("artwork_id") <= end_id
+        condition = upper if condition is None else condition & upper
+    df = dataset.to_table(columns=columns, filter=condition).to_pandas()
+    if "artwork_id" in df:
+        df = df.sort_values("artwork_id", ignore_index=True)
+    return df
+
+
+# Function to export a Parquet dataset back to a CSV with the original schema
+def parquet_to_csv(out_dir, csv_path):
+    df = read_parquet(out_dir)
+    table_to_frame(df).to_csv(csv_path, index=False)
@@ -0,0 +1,127 @@
+# Streaming CSV output with a checkpoint manifest for resumable crawls.
+# Each finished row is appended to the CSV straight away, and its artwork ID is
+# recorded in a manifest next to it together with the CSV size after the write.
+# A restarted crawl reads the manifest, truncates any partially written row and
+# skips every ID that is already done.
+
+import csv
+import os
+
+
+# Function to get the manifest path for a CSV output file
+def manifest_path(output):
+    return output + ".done"
+
+
+# Function to read the (id, CSV offset) entries of a manifest, stopping at the first
+# torn one: a line is only complete once its newline is written, and offsets never
+# go down, so "30700,12" cut from "30700,123456" is not mistaken for a valid entry
+# Returns (entries, bytes of the manifest they span)
+def read_manifest(output):
+    entries = []
+    valid_bytes = 0
+    with open(manifest_path(output), 'rb') as file:
+        for line in file:
+            parts = line.decode('utf-8', errors='replace').strip().split(",")
+            if not line.endswith(b"\n") or len(parts) != 2 or not all(p.isdigit() for p in parts):
+                break
+            if entries and int(parts[1]) < entries[-1][1]:
+                break
+            entries.append((int(parts[0]), int(parts[1])))
+            valid_bytes += len(line)
+    return entries, valid_bytes
+
+
+# Function to read completed IDs from the manifest and trim the CSV to the last
+# recorded row, so a crash mid-write never leaves a torn or duplicated row
+# A torn manifest line is trimmed as well, so new entries start on a fresh line
+def load_completed(output):
+    manifest = manifest_path(output)
+    if not os.path.exists(output) or not os.path.exists(manifest):
+        return set()
+
+    entries, valid_bytes = read_manifest(output)
+    if os.path.getsize(manifest) > valid_bytes:
+        with open(manifest, 'r+b') as file:
+            file.truncate(valid_bytes)
+    if entries and os.path.getsize(output) > entries[-1][1]:
+        with open(output, 'r+b') as file:
+            file.truncate(entries[-1][1])
+    return {artwork_id for artwork_id, _ in entries}
+
+
+# Function to yield the lines of a binary file that end within its first `limit` bytes
+def _lines_upto(file, limit):
+    read = 0
+    for line in file:
+        read += len(line)
+        if read > limit:
+            return
+        yield line.decode('utf-8')
+
+
+# Function to read (id, row) pairs from a checkpointed CSV without modifying it
+# Only rows up to the last manifest offset are read, so this is safe while a
+# worker is still appending. Without a manifest, IDs count up from start_id.
+def read_rows(output, columns, start_id=None):
+    if os.path.exists(manifest_path(output)):
+        entries, _ = read_manifest(output)
+        artwork_ids = [artwork_id for artwork_id, _ in entries]
+        limit = entries[-1][1] if entries else 0
+    elif start_id is not None:
+        artwork_ids = None
+        limit = os.path.getsize(output)
+    else:
+        raise ValueError(f"No manifest for {output}; pass start_id")
+    with open(output, 'rb') as file:
+        reader = csv.reader(_lines_upto(file, limit))
+        header = next(reader, None)
+        if limit and header != columns:
+            raise ValueError(f"{output} does not have the expected CSV columns")
+        for index, row in enumerate(reader):
+            if artwork_ids is None:
+                yield start_id + index, row
+            elif index < len(artwork_ids):
+                yield artwork_ids[index], row
+
+
+# Appends rows to the CSV and records each finished ID in the manifest
+class CheckpointWriter:
+    def __init__(self, output, columns, resume=True):
+        self.output = output
+        self.manifest = manifest_path(output)
+        self.completed = load_completed(output) if resume else set()
+
+        fresh = not self.completed
+        if fresh:
+            with open(self.output, mode='w', newline='', encoding='utf-8') as file:
+                csv.writer(file).writerow(columns)
+            with open(self.manifest, mode='w', encoding='utf-8'):
+                pass
+
+        self.csv_file = open(self.output, mode='a', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.csv_file)
+        self.manifest_file = open(self.manifest, mode='a', encoding='utf-8')
+
+    # Function to check whether an ID was finished by an earlier run
+    def is_done(self, artwork_id):
+        return artwork_id in self.completed
+
+    # Function to append one row and checkpoint its ID
+    def write(self, artwork_id, row):
+        self.writer.writerow(row)
+        self.csv_file.flush()
+        offset = os.fstat(self.csv_file.fileno()).st_size
+        self.manifest_file.write(f"{artwork_id},{offset}\n")
+        self.manifest_file.flush()
+        self.completed.add(artwork_id)
+
+    def close(self):
+        self.csv_file.close()
+        self.manifest_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
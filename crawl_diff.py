@@ -0,0 +1,165 @@
+# Change detection for re-running the analysis crawl over a range done before.
+# Instead of re-analyzing every token, the diff fetches only the GraphQL metadata
+# (one batched round-trip per batch) and compares the scheme and root CID of each
+# token's URIs with the CID columns of the previous output. The IPFS download,
+# library scan and Run check are repeated only for tokens that are new, errored
+# last time (including code that could not be fetched), have a changed CID, or
+# that the API no longer returns; every other row is copied from the previous
+# output unchanged. Tokens whose metadata batch
+# failed cannot be compared and keep their previous row until the next diff, and
+# a re-analysis that errors never replaces a previous successful row.
+
+from collections import Counter, deque
+import os
+
+from crawl_checkpoint import CheckpointWriter, manifest_path, read_rows
+from fxhash_graphql import GRAPHQL_URL, BatchTokenFetcher
+from ipfs_cache import parse_content_url
+from updatedFxhash import ARTWORK_URL, CODE_FETCH_ERROR, CSV_COLUMNS, URI_TYPES, crawl_rows, ipfs_to_http
+
+# CSV column holding each URI type, in the form ipfs_to_http writes it
+URI_COLUMNS = {
+    "artifactUri": "Artifact URI fxhash",
+    "displayUri": "Display URI fxhash",
+    "thumbnailUri": "Thumbnail URI fxhash",
+    "generativeUri": "Generative URI fxhash",
+}
+
+# Reasons a token is analyzed again
+REANALYZE = ("new", "errored", "changed", "missing")
+
+# Reasons the previous row is kept as it is
+KEEP = ("unchanged", "unverified")
+
+
+# First artwork ID of an output written before checkpoint manifests existed
+# (the shipped fxhash_artwork_analysis.csv starts here)
+LEGACY_START_ID = 30661
+
+
+# Function to get the path the URLs needing a Run re-check are written to
+def recheck_path(output):
+    return output + ".recheck"
+
+
+# Function to read the previous output as {id: row}
+# IDs come from the checkpoint manifest; a CSV without one is numbered from
+# `start_id`, which is where that file starts, not where the diff range starts
+def load_previous(path, start_id=LEGACY_START_ID):
+    if not os.path.exists(path):
+        return {}
+    return dict(read_rows(path, CSV_COLUMNS, start_id))
+
+
+# Function to reduce a gateway URL to (scheme, root CID); other values are kept as they are
+# Scraped rows carry JSON-escaped query strings (\u0026) where GraphQL has "&",
+# so only the content address itself is compared
+def content_id(url):
+    key = parse_content_url(url)
+    return key[:2] if key is not None else url
+
+
+# Function to list the URI types whose CID differs from the previous row
+def changed_uris(token, row):
+    columns = dict(zip(CSV_COLUMNS, row))
+    return [uri_type for uri_type in URI_TYPES
+            if content_id(ipfs_to_http(token.get(uri_type) or "-")[1]) != content_id(columns[URI_COLUMNS[uri_type]])]
+
+
+# Function to tell whether a row records a failed analysis: an error status, or
+# a working page whose code could not be fetched
+def is_error(row):
+    return row[0] != "working" or row[CSV_COLUMNS.index("p5.js Versions")].startswith(CODE_FETCH_ERROR)
+
+
+# Function to decide why (or whether) a token needs analyzing again
+# `fetched` is False when the token's metadata batch failed, as opposed to the
+# API answering that there is no such token (fetched, token None)
+def classify(token, row, fetched=True):
+    if row is None:
+        return "new"
+    if is_error(row):
+        return "errored"
+    if not fetched:
+        return "unverified"
+    if token is None:
+        return "missing"
+    return "changed" if changed_uris(token, row) else "unchanged"
+
+
+# Hands crawl_rows the metadata the diff already fetched, so GraphQL is not queried twice
+# IDs without metadata are left out, which sends them down the REST/scrape fallback
+class PrefetchedTokens:
+    def __init__(self, tokens, batch_size=50, url=GRAPHQL_URL):
+        self.tokens = tokens
+        self.batch_size = batch_size
+        self.url = url
+
+    def fetch(self, artwork_ids):
+        return {artwork_id: self.tokens[artwork_id] for artwork_id in artwork_ids if artwork_id in self.tokens}
+
+
+# Function to re-analyze only what changed since the previous output and write a new one
+# `output` is replaced once the diff completes; a crash leaves the previous output
+# intact. Previous rows outside the range are kept but not counted. Returns a
+# Counter of reasons for the IDs in the range, plus "failed" for re-analyses that
+# errored and left a previous working row in place.
+# `previous_start_id` is the first ID of a previous output that has no manifest.
+async def diff_crawl(start_id, end_id, output, limiter=None, fetcher=None, previous_start_id=LEGACY_START_ID):
+    previous = load_previous(output, previous_start_id)
+    artwork_ids = range(start_id, end_id + 1)
+    fetcher = fetcher or BatchTokenFetcher()
+    tokens = fetcher.fetch(artwork_ids)
+
+    reasons = {
+        artwork_id: classify(tokens.get(artwork_id), previous.get(artwork_id), artwork_id in tokens)
+        for artwork_id in artwork_ids
+    }
+    reanalyze = [artwork_id for artwork_id, reason in reasons.items() if reason in REANALYZE]
+    unchanged = deque(sorted(
+        [artwork_id for artwork_id, reason in reasons.items() if reason in KEEP]
+        + [artwork_id for artwork_id in previous if artwork_id not in reasons]
+    ))
+
+    counts = Counter(reasons.values())
+    recheck = []
+    staging = output + ".diff"
+    with CheckpointWriter(staging, CSV_COLUMNS, resume=False) as writer:
+        async for artwork_id, row in crawl_rows(reanalyze, limiter, fetcher=PrefetchedTokens(tokens)):
+            while unchanged and unchanged[0] < artwork_id:
+                kept = unchanged.popleft()
+                writer.write(kept, previous[kept])
+            earlier = previous.get(artwork_id)
+            if is_error(row) and earlier is not None and not is_error(earlier):
+                counts["failed"] += 1
+                row = earlier
+            else:
+                recheck.append(artwork_id)
+            writer.write(artwork_id, row)
+        while unchanged:
+            kept = unchanged.popleft()
+            writer.write(kept, previous[kept])
+    os.replace(staging, output)
+    os.replace(manifest_path(staging), manifest_path(output))
+
+    with open(recheck_path(output), mode='w', encoding='utf-8') as file:
+        for artwork_id in recheck:
+            file.write(ARTWORK_URL.format(artwork_id) + "\n")
+    return counts
+
+
+# Function to print how much work the diff skipped
+def print_report(counts, output):
+    redone = sum(counts[reason] for reason in REANALYZE)
+    total = redone + sum(counts[reason] for reason in KEEP)
+    skipped = total - redone
+    print("Diff: " + ", ".join(f"{counts[reason]} {reason}" for reason in REANALYZE + KEEP))
+    share = 100 * skipped / total if total else 0.0
+    print(f"Diff: skipped {skipped} of {total} IPFS downloads, library scans and Run checks ({share:.1f}%)")
+    if counts["unverified"]:
+        print(f"Diff: {counts['unverified']} tokens kept their previous row because their metadata lookup failed")
+    if counts["failed"]:
+        print(f"Diff: {counts['failed']} re-analyses failed; their previous working rows were kept")
+    if redone > counts["failed"]:
+        print(f"Diff: Run-check the re-analyzed tokens with "
+              f"`python code_for_button_check.py @{recheck_path(output)} --output <csv>`")
@@ -0,0 +1,173 @@
+# Per-stage timing for the crawl pipeline.
+# Code wraps each stage (API fetch, IPFS fetch, library extraction, static
+# analysis, Run-button check, ...) in a span that records its duration, bytes
+# transferred, status and the gateway used. The tracer prints periodic
+# p50/p95/p99 summaries. Memory stays flat however long the crawl runs: the
+# percentiles come from a fixed-size random sample of each stage's durations,
+# and spans are not kept but streamed to the trace file as JSON lines (a header,
+# one line per span, and the summary as the last line).
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+import functools
+import json
+import random
+import threading
+import time
+
+# Span currently open in this thread / task, so helpers deep in the call stack
+# (gateway failover, cache lookups) can annotate it without extra arguments
+current_span = ContextVar("current_span", default=None)
+
+
+# Function to compute a percentile from a sorted list of numbers
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+# Function to add attributes (bytes, status, gateway, ...) to the open span, if any
+def annotate(**attrs):
+    span = current_span.get()
+    if span is not None:
+        span.update(attrs)
+
+
+# Uniform random sample of at most `size` values from a stream (reservoir sampling)
+class Reservoir:
+    def __init__(self, size, rng):
+        self.size = size
+        self.rng = rng
+        self.values = []
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        if len(self.values) < self.size:
+            self.values.append(value)
+        else:
+            index = self.rng.randrange(self.count)
+            if index < self.size:
+                self.values[index] = value
+
+
+class Tracer:
+    def __init__(self, report_every=30.0, sample_size=4096):
+        self.report_every = report_every
+        self.sample_size = sample_size
+        self.rng = random.Random()
+        self.durations = {}
+        self.byte_totals = {}
+        self.errors = {}
+        self.trace_path = None
+        self.trace_file = None
+        self.started = time.time()
+        self.last_report = time.monotonic()
+        self.lock = threading.Lock()
+
+    # Function to start streaming spans to a JSON-lines trace file, replacing it
+    def stream_to(self, path):
+        with self.lock:
+            if self.trace_file is not None:
+                self.trace_file.close()
+            self.trace_path = path
+            self.trace_file = open(path, mode='w', encoding='utf-8')
+            self.trace_file.write(json.dumps({"started": self.started}) + "\n")
+
+    # Function to record one finished span
+    def record(self, stage, seconds, **attrs):
+        span = {"stage": stage, "start": attrs.pop("start", time.time() - seconds), "seconds": seconds}
+        span.update(attrs)
+        with self.lock:
+            if stage not in self.durations:
+                self.durations[stage] = Reservoir(self.sample_size, self.rng)
+            self.durations[stage].add(seconds)
+            self.byte_totals[stage] = self.byte_totals.get(stage, 0) + (attrs.get("bytes") or 0)
+            if attrs.get("status") not in (None, "ok"):
+                self.errors[stage] = self.errors.get(stage, 0) + 1
+            if self.trace_file is not None:
+                self.trace_file.write(json.dumps(span, default=str) + "\n")
+
+    # Context manager timing a stage; the yielded dict takes extra attributes
+    @contextmanager
+    def span(self, stage, **attrs):
+        attrs.setdefault("status", "ok")
+        token = current_span.set(attrs)
+        start = time.time()
+        started = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs["status"] = f"error: {e.__class__.__name__}"
+            raise
+        finally:
+            current_span.reset(token)
+            self.record(stage, time.perf_counter() - started, start=start, **attrs)
+
+    # Function to summarize every stage: count, latency percentiles, bytes, errors
+    def summary(self):
+        with self.lock:
+            stages = {stage: (sample.count, list(sample.values)) for stage, sample in self.durations.items()}
+            byte_totals = dict(self.byte_totals)
+            errors = dict(self.errors)
+        elapsed = max(time.time() - self.started, 1e-9)
+        result = {}
+        for stage, (count, values) in stages.items():
+            values.sort()
+            result[stage] = {
+                "count": count,
+                "per_sec": count / elapsed,
+                "p50": percentile(values, 0.50),
+                "p95": percentile(values, 0.95),
+                "p99": percentile(values, 0.99),
+                "bytes": byte_totals.get(stage, 0),
+                "errors": errors.get(stage, 0),
+            }
+        return result
+
+    # Function to print the summary as a small table
+    def print_summary(self):
+        print(f"{'stage':28}{'count':>8}{'/s':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'MB':>9}{'errors':>8}")
+        for stage, stats in sorted(self.summary().items()):
+            print(
+                f"{stage:28}{stats['count']:8d}{stats['per_sec']:8.1f}"
+                f"{stats['p50'] * 1000:10.1f}{stats['p95'] * 1000:10.1f}{stats['p99'] * 1000:10.1f}"
+                f"{stats['bytes'] / 1e6:9.2f}{stats['errors']:8d}"
+            )
+
+    # Function to print the summary if `report_every` seconds have passed since the last one
+    def maybe_report(self):
+        now = time.monotonic()
+        if now - self.last_report >= self.report_every:
+            self.last_report = now
+            self.print_summary()
+
+    # Function to finish the trace file with the summary
+    # A path other than the one being streamed to gets a header and the summary only
+    def write_json(self, path):
+        summary = {"finished": time.time(), "summary": self.summary()}
+        with self.lock:
+            if path == self.trace_path:
+                file, self.trace_file, self.trace_path = self.trace_file, None, None
+            else:
+                file = open(path, mode='w', encoding='utf-8')
+                file.write(json.dumps({"started": self.started}) + "\n")
+            with file:
+                file.write(json.dumps(summary) + "\n")
+
+
+# Process-wide tracer used by all the scripts
+tracer = Tracer()
+
+
+# Decorator wrapping every call of a function in a span for `stage`
+def traced(stage):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
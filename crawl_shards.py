@@ -0,0 +1,297 @@
+# Sharded crawls across several machines.
+# The artwork ID range is split into shards recorded in a SQLite work queue.
+# Workers lease one shard at a time, renew the lease with a heartbeat while
+# they crawl it, and mark it done at the end; a shard whose worker fails (or
+# stops heartbeating) goes back to the queue. Each worker writes its own
+# checkpointed CSV per shard, and `merge` combines them into one ID-ordered CSV
+# in the fxhash_artwork_analysis.csv schema with one row per artwork.
+#
+# The queue file has to be reachable by every worker (a shared volume); SQLite
+# locking is reliable on local disks and most network filesystems with proper
+# lock support.
+#
+#   python crawl_shards.py init --start-id 1 --end-id 40000 --shard-size 500
+#   python crawl_shards.py work          (on each machine, as many as needed)
+#   python crawl_shards.py status
+#   python crawl_shards.py merge --output fxhash_artwork_analysis.csv
+
+import argparse
+import asyncio
+import glob
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from crawl_checkpoint import CheckpointWriter, manifest_path, read_rows
+from crawl_diff import is_error
+from crawl_metrics import tracer
+from updatedFxhash import CSV_COLUMNS, crawl_to_csv
+
+QUEUE_PATH = "crawl_shards.sqlite"
+SHARD_DIR = "shards"
+DEFAULT_SHARD_SIZE = 500
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+
+
+class ShardQueue:
+    def __init__(self, path=QUEUE_PATH):
+        self.path = path
+        with self._connect() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS shards (
+                    shard_id INTEGER PRIMARY KEY,
+                    start_id INTEGER NOT NULL,
+                    end_id INTEGER NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    worker TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    updated REAL
+                )
+            """)
+
+    # Function to open a connection; each thread and call gets its own
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        db.execute("PRAGMA busy_timeout = 60000")
+        return db
+
+    # Function to split [start_id, end_id] into shards, skipping ranges already queued
+    def add_range(self, start_id, end_id, shard_size=DEFAULT_SHARD_SIZE):
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            existing = {row[0] for row in db.execute("SELECT start_id FROM shards")}
+            added = 0
+            for shard_start in range(start_id, end_id + 1, shard_size):
+                if shard_start in existing:
+                    continue
+                db.execute(
+                    "INSERT INTO shards (start_id, end_id, updated) VALUES (?, ?, ?)",
+                    (shard_start, min(shard_start + shard_size - 1, end_id), time.time()),
+                )
+                added += 1
+            db.execute("COMMIT")
+            return added
+        finally:
+            db.close()
+
+    # Function to lease the next pending shard, or one whose lease ran out
+    # Returns (shard_id, start_id, end_id) or None when nothing is left to do
+    def lease(self, worker, lease_seconds=LEASE_SECONDS):
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            row = db.execute(
+                "SELECT shard_id, start_id, end_id FROM shards "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY shard_id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is not None:
+                db.execute(
+                    "UPDATE shards SET status = 'leased', worker = ?, lease_expires = ?, "
+                    "attempts = attempts + 1, updated = ? WHERE shard_id = ?",
+                    (worker, now + lease_seconds, now, row[0]),
+                )
+            db.execute("COMMIT")
+            return row
+        finally:
+            db.close()
+
+    # Function to extend a lease; False if the shard was handed to another worker meanwhile
+    def heartbeat(self, shard_id, worker, lease_seconds=LEASE_SECONDS):
+        with self._connect() as db:
+            now = time.time()
+            cursor = db.execute(
+                "UPDATE shards SET lease_expires = ?, updated = ? "
+                "WHERE shard_id = ? AND worker = ? AND status = 'leased'",
+                (now + lease_seconds, now, shard_id, worker),
+            )
+            return cursor.rowcount == 1
+
+    # Function to mark a leased shard as finished
+    def complete(self, shard_id, worker):
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE shards SET status = 'done', lease_expires = NULL, last_error = NULL, updated = ? "
+                "WHERE shard_id = ? AND worker = ? AND status = 'leased'",
+                (time.time(), shard_id, worker),
+            )
+            return cursor.rowcount == 1
+
+    # Function to give a shard back after a failure; it is marked failed once it has used up its attempts
+    def release(self, shard_id, worker, error, max_attempts=MAX_ATTEMPTS):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE shards SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "worker = NULL, lease_expires = NULL, last_error = ?, updated = ? "
+                "WHERE shard_id = ? AND worker = ? AND status = 'leased'",
+                (max_attempts, str(error)[:500], time.time(), shard_id, worker),
+            )
+
+    # Function to put failed shards back in the queue
+    def retry_failed(self):
+        with self._connect() as db:
+            return db.execute(
+                "UPDATE shards SET status = 'pending', attempts = 0, updated = ? WHERE status = 'failed'",
+                (time.time(),),
+            ).rowcount
+
+    # Function to count shards per status
+    def counts(self):
+        with self._connect() as db:
+            return dict(db.execute("SELECT status, COUNT(*) FROM shards GROUP BY status").fetchall())
+
+    # Function to list every shard, for reporting
+    def shards(self):
+        with self._connect() as db:
+            return db.execute(
+                "SELECT shard_id, start_id, end_id, status, worker, attempts, last_error FROM shards ORDER BY shard_id"
+            ).fetchall()
+
+
+# Renews a shard's lease in the background while the crawl runs
+class Heartbeat:
+    def __init__(self, queue, shard_id, worker, lease_seconds=LEASE_SECONDS):
+        self.queue = queue
+        self.shard_id = shard_id
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.lease_seconds / 3):
+            if not self.queue.heartbeat(self.shard_id, self.worker, self.lease_seconds):
+                print(f"Lost the lease on shard {self.shard_id}; another worker has taken it over")
+                self.lost = True
+                return
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+# Function to get the CSV a worker writes for a shard
+# Per-worker files, so a shard taken over after a lost lease never has two writers
+def shard_output(shard_dir, start_id, end_id, worker):
+    return os.path.join(shard_dir, f"shard_{start_id}_{end_id}.{worker}.csv")
+
+
+# Function to lease and crawl shards until the queue is empty (or `max_shards` are done)
+def work(queue, worker, shard_dir=SHARD_DIR, lease_seconds=LEASE_SECONDS, max_shards=None):
+    os.makedirs(shard_dir, exist_ok=True)
+    done = 0
+    while max_shards is None or done < max_shards:
+        shard = queue.lease(worker, lease_seconds)
+        if shard is None:
+            break
+        shard_id, start_id, end_id = shard
+        output = shard_output(shard_dir, start_id, end_id, worker)
+        print(f"{worker}: crawling shard {shard_id} ({start_id}-{end_id})")
+        try:
+            with Heartbeat(queue, shard_id, worker, lease_seconds) as heartbeat:
+                with tracer.span("crawl_shard", shard=shard_id):
+                    with CheckpointWriter(output, CSV_COLUMNS) as writer:
+                        asyncio.run(crawl_to_csv(start_id, end_id, writer))
+        except BaseException as e:
+            queue.release(shard_id, worker, f"{e.__class__.__name__}: {e}")
+            if not isinstance(e, Exception):
+                raise
+            print(f"{worker}: shard {shard_id} failed: {e}")
+            continue
+        if heartbeat.lost or not queue.complete(shard_id, worker):
+            print(f"{worker}: shard {shard_id} finished after its lease was lost; another worker owns it")
+        done += 1
+    return done
+
+
+# Function to merge every shard CSV into one deduplicated, ID-ordered CSV
+# When an ID was crawled more than once, a successful row wins over an error row
+# Returns (rows written, IDs found in more than one shard file)
+def merge(shard_dir, output, start_id=None, end_id=None):
+    rows = {}
+    duplicates = 0
+    for path in sorted(glob.glob(os.path.join(shard_dir, "shard_*.csv"))):
+        if not os.path.exists(manifest_path(path)):
+            continue
+        # Shards may still be leased: read up to the last checkpointed row, never trim
+        for artwork_id, row in read_rows(path, CSV_COLUMNS):
+            if start_id is not None and artwork_id < start_id or end_id is not None and artwork_id > end_id:
+                continue
+            if artwork_id in rows:
+                duplicates += 1
+                if not is_error(rows[artwork_id]) or is_error(row):
+                    continue
+            rows[artwork_id] = row
+
+    with CheckpointWriter(output, CSV_COLUMNS, resume=False) as writer:
+        for artwork_id in sorted(rows):
+            writer.write(artwork_id, rows[artwork_id])
+    return len(rows), duplicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl fxhash artworks in shards across several workers")
+    parser.add_argument("--queue", default=QUEUE_PATH, help="SQLite work queue shared by all workers")
+    parser.add_argument("--shard-dir", default=SHARD_DIR, help="directory for the per-shard CSVs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    init = commands.add_parser("init", help="split an ID range into shards")
+    init.add_argument("--start-id", type=int, default=30661)
+    init.add_argument("--end-id", type=int, default=31600)
+    init.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+
+    worker = commands.add_parser("work", help="lease and crawl shards until none are left")
+    worker.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}")
+    worker.add_argument("--lease-seconds", type=int, default=LEASE_SECONDS)
+    worker.add_argument("--max-shards", type=int)
+    worker.add_argument("--trace", help="where to write the JSON-lines timing trace")
+
+    commands.add_parser("status", help="show the state of every shard")
+    commands.add_parser("retry-failed", help="put failed shards back in the queue")
+
+    merger = commands.add_parser("merge", help="combine the shard CSVs into one analysis CSV")
+    merger.add_argument("--output", default="fxhash_artwork_analysis.csv")
+    merger.add_argument("--start-id", type=int)
+    merger.add_argument("--end-id", type=int)
+    args = parser.parse_args()
+
+    queue = ShardQueue(args.queue)
+    if args.command == "init":
+        added = queue.add_range(args.start_id, args.end_id, args.shard_size)
+        print(f"Queued {added} shards; {queue.counts()}")
+    elif args.command == "work":
+        if args.trace:
+            tracer.stream_to(args.trace)
+        done = work(queue, args.worker_id, args.shard_dir, args.lease_seconds, args.max_shards)
+        print(f"{args.worker_id}: crawled {done} shards; queue: {queue.counts()}")
+        if args.trace:
+            tracer.write_json(args.trace)
+    elif args.command == "status":
+        for shard_id, start_id, end_id, status, owner, attempts, error in queue.shards():
+            print(f"{shard_id:6d} {start_id:8d}-{end_id:<8d} {status:8} {owner or '-':24} {attempts} {error or ''}")
+        print(queue.counts())
+    elif args.command == "retry-failed":
+        print(f"Requeued {queue.retry_failed()} shards")
+    elif args.command == "merge":
+        counts = queue.counts()
+        if set(counts) - {"done"}:
+            print(f"Warning: not every shard is done ({counts}); merging what is there")
+        written, duplicates = merge(args.shard_dir, args.output, args.start_id, args.end_id)
+        print(f"Wrote {written} artworks to {args.output} ({duplicates} duplicate rows dropped)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# Batched generative token lookups against the fxhash GraphQL API.
+# Many `generativeToken(id:)` lookups are aliased into a single request, so N
+# tokens cost one round-trip instead of N. The batch size adapts to how the API
+# responds, and an optional request budget caps the total number of calls.
+
+import json
+import threading
+
+import requests
+
+from crawl_metrics import annotate, traced
+from ipfs_cache import gateway_url
+from rate_limiter import CircuitOpenError
+import http_client
+
+GRAPHQL_URL = "https://api.fxhash.xyz/graphql"
+
+# Fields pulled for every token; artifactUri and description live in metadata
+TOKEN_FIELDS = """
+    id
+    name
+    generativeUri
+    displayUri
+    thumbnailUri
+    metadata
+    author {
+      name
+    }
+"""
+
+
+# Function to build one GraphQL query that looks up every ID under its own alias
+def build_batch_query(artwork_ids, fields=TOKEN_FIELDS):
+    lookups = "\n".join(
+        f"  t{artwork_id}: generativeToken(id: {int(artwork_id)}) {{{fields}}}" for artwork_id in artwork_ids
+    )
+    return "query GenerativeTokenBatch {\n" + lookups + "\n}"
+
+
+# Function to flatten a GraphQL token into the shape of the REST `token` object
+def normalize_token(token):
+    metadata = token.get("metadata") or {}
+    if isinstance(metadata, str):
+        metadata = json.loads(metadata)
+    generative_uri = token.get("generativeUri") or metadata.get("generativeUri") or "-"
+    ipfs_link = "-"
+    if generative_uri.startswith(("ipfs://", "onchfs://")):
+        ipfs_link = gateway_url(generative_uri)
+    return {
+        "id": token.get("id"),
+        "name": token.get("name"),
+        "description": metadata.get("description") or "-",
+        "author": (token.get("author") or {}).get("name"),
+        "ipfs": ipfs_link,
+        "artifactUri": metadata.get("artifactUri") or "-",
+        "displayUri": token.get("displayUri") or metadata.get("displayUri") or "-",
+        "thumbnailUri": token.get("thumbnailUri") or metadata.get("thumbnailUri") or "-",
+        "generativeUri": generative_uri,
+    }
+
+
+class BatchTokenFetcher:
+    def __init__(self, batch_size=50, min_batch=5, max_batch=200, request_budget=None,
+                 url=GRAPHQL_URL, timeout=10):
+        self.batch_size = batch_size
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.request_budget = request_budget
+        self.url = url
+        self.timeout = timeout
+        self.requests_made = 0
+        self.lock = threading.Lock()
+
+    # Function to reserve one request from the budget, False once it is spent
+    def _take_budget(self):
+        with self.lock:
+            if self.request_budget is not None and self.requests_made >= self.request_budget:
+                return False
+            self.requests_made += 1
+            return True
+
+    # Function to shrink the batch size after a failed request
+    def _shrink(self):
+        with self.lock:
+            self.batch_size = max(self.min_batch, self.batch_size // 2)
+
+    # Function to grow the batch size after a successful request
+    # Additive increase / multiplicative decrease, so it settles just under the API limit
+    def _grow(self):
+        with self.lock:
+            self.batch_size = min(self.max_batch, self.batch_size + self.min_batch)
+
+    # Function to send one aliased query, returning {id: raw token or None}
+    # Raises requests.exceptions.RequestException or ValueError on failure
+    @traced("graphql_batch")
+    def _query(self, artwork_ids):
+        response = http_client.post(self.url, json={"query": build_batch_query(artwork_ids)}, timeout=self.timeout)
+        annotate(bytes=len(response.content), tokens=len(artwork_ids))
+        data = response.json().get("data")
+        if not data:
+            raise ValueError(f"GraphQL error: {response.text[:200]}")
+        return {artwork_id: data.get(f"t{artwork_id}") for artwork_id in artwork_ids}
+
+    # Function to fetch raw tokens for any number of IDs, splitting into batches
+    # IDs that could not be fetched (errors or exhausted budget) are left out
+    def fetch_raw(self, artwork_ids):
+        results = {}
+        queue = [list(dict.fromkeys(artwork_ids))]
+        while queue:
+            ids = queue.pop(0)
+            if len(ids) > self.batch_size:
+                queue[:0] = [ids[:self.batch_size], ids[self.batch_size:]]
+                continue
+            if not self._take_budget():
+                break
+            try:
+                results.update(self._query(ids))
+                self._grow()
+            except CircuitOpenError as e:
+                # The API is down; splitting the batch would only fail faster
+                print(f"Batch of {len(ids)} tokens skipped: {e}")
+                break
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"Batch of {len(ids)} tokens failed: {e}")
+                self._shrink()
+                # Retry the two halves separately unless we are already at the minimum
+                if len(ids) > self.min_batch:
+                    middle = len(ids) // 2
+                    queue[:0] = [ids[:middle], ids[middle:]]
+        return results
+
+    # Function to fetch normalized tokens, {id: token or None for unknown IDs}
+    def fetch(self, artwork_ids):
+        return {
+            artwork_id: normalize_token(token) if token else None
+            for artwork_id, token in self.fetch_raw(artwork_ids).items()
+        }
@@ -0,0 +1,231 @@
+# Shared HTTP client for all the fxhash scripts.
+# One requests.Session with per-host connection pools (keep-alive), retries with
+# jittered exponential backoff, and IPFS / onchfs fetches that fail over between
+# gateways, trying the fastest gateway first based on the latencies seen so far.
+# Every request to a known host goes through its rate limit and circuit breaker
+# (see rate_limiter.py).
+# Setting FXHASH_REPLAY_URL sends all fxhash and gateway traffic to a local
+# replay server instead (see benchmark_suite.py); ONCHFS_PROXY_URL points onchfs
+# fetches at a locally run onchfs HTTP proxy.
+
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+import os
+import random
+import threading
+import time
+
+import requests
+
+from crawl_metrics import annotate
+from rate_limiter import limit_for, parse_retry_after
+
+# IPFS gateways in their initial preference order
+IPFS_GATEWAYS = [
+    "https://gateway.fxhash2.xyz",
+    "https://gateway.ipfs.io",
+]
+
+# HTTP proxies serving onchfs (fxhash on-chain file system) content
+ONCHFS_GATEWAYS = [
+    "https://onchfs.fxhash2.xyz",
+]
+
+POOL_CONNECTIONS = 16
+POOL_MAXSIZE = 32
+
+# Status codes worth retrying; anything else is returned to the caller as is
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# How many 429 responses a request waits out (per Retry-After) before giving up
+THROTTLE_RETRIES = 5
+
+# Hosts the scripts talk to, and where requests for them are sent instead (if anywhere)
+KNOWN_HOSTS = ["api.fxhash.xyz", "www.fxhash.xyz", "gateway.fxhash2.xyz", "gateway.ipfs.io", "onchfs.fxhash2.xyz"]
+HOST_OVERRIDES = {}
+
+
+# Function to send requests for `hosts` to `base_url`/<host>/<path> instead
+def redirect_hosts(base_url, hosts=KNOWN_HOSTS):
+    for host in hosts:
+        HOST_OVERRIDES[host] = f"{base_url.rstrip('/')}/{host}"
+
+
+# Function to apply any host override to a URL
+def resolve_url(url):
+    parsed = urlparse(url)
+    base = HOST_OVERRIDES.get(parsed.hostname)
+    if base is None:
+        return url
+    return base + url[len(f"{parsed.scheme}://{parsed.netloc}"):]
+
+
+if os.environ.get("FXHASH_REPLAY_URL"):
+    redirect_hosts(os.environ["FXHASH_REPLAY_URL"])
+if os.environ.get("ONCHFS_PROXY_URL"):
+    for gateway in ONCHFS_GATEWAYS:
+        HOST_OVERRIDES[urlparse(gateway).hostname] = os.environ["ONCHFS_PROXY_URL"].rstrip("/")
+
+
+# Function to build a session with connection pooling for every host
+def make_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+session = make_session()
+
+
+# Function to compute the delay before retry number `attempt` (0-based)
+# Full jitter: a random delay between 0 and base * 2**attempt, capped
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# Function to sleep before retry number `attempt`
+def backoff_sleep(attempt, base=0.5, cap=30.0):
+    time.sleep(backoff_delay(attempt, base, cap))
+
+
+# Function to wait out a 429 from a host without a rate limiter to pause it
+# Sleeps for Retry-After when the response had one, else backs off like retry `throttled`
+def throttle_sleep(retry_after, throttled):
+    time.sleep(backoff_delay(throttled) if retry_after is None else retry_after)
+
+
+# Function to send a request, retrying connection errors, timeouts and 5xx responses
+# 429s are waited out per Retry-After (up to `throttle_retries` times) without using up `retries`
+# Raises requests.exceptions.RequestException once the retries are used up, and
+# rate_limiter.CircuitOpenError without sending anything if the host's circuit is open
+# The circuit breaker sees one outcome per request, recorded on every exit path,
+# so a half-open probe is always resolved
+def request(method, url, retries=2, timeout=5, throttle_retries=THROTTLE_RETRIES, **kwargs):
+    limit = limit_for(url)
+    if limit is None:
+        return send_with_retries(method, url, None, retries, timeout, throttle_retries, **kwargs)
+    limit.admit()
+    healthy = False
+    try:
+        response = send_with_retries(method, url, limit, retries, timeout, throttle_retries, **kwargs)
+        healthy = True
+        return response
+    except requests.exceptions.HTTPError as e:
+        # A 4xx still means the host is answering; 5xx and exhausted 429s count against it
+        status = e.response.status_code if e.response is not None else None
+        healthy = status is not None and status not in RETRY_STATUSES and status != 429
+        raise
+    finally:
+        limit.finished(healthy)
+
+
+# Function to run the attempts of one request, waiting for a rate-limit slot before each
+def send_with_retries(method, url, limit, retries, timeout, throttle_retries, **kwargs):
+    attempt = 0
+    throttled = 0
+    while True:
+        if limit is not None:
+            limit.acquire()
+        try:
+            response = session.request(method, resolve_url(url), timeout=timeout, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt == retries:
+                raise
+        else:
+            if response.status_code == 429:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if limit is not None:
+                    limit.throttled(retry_after)
+                if throttled < throttle_retries:
+                    if limit is None:
+                        throttle_sleep(retry_after, throttled)
+                    throttled += 1
+                    continue
+                response.raise_for_status()
+            if limit is not None and response.status_code not in RETRY_STATUSES:
+                limit.succeeded()
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                response.raise_for_status()
+                return response
+        backoff_sleep(attempt)
+        attempt += 1
+
+
+def get(url, retries=2, timeout=5, **kwargs):
+    return request("GET", url, retries=retries, timeout=timeout, **kwargs)
+
+
+def post(url, retries=2, timeout=5, **kwargs):
+    return request("POST", url, retries=retries, timeout=timeout, **kwargs)
+
+
+# Keeps a moving average of response time per gateway and orders them by it
+class GatewayRanker:
+    def __init__(self, gateways=None, alpha=0.3, failure_penalty=10.0):
+        self.gateways = list(gateways or IPFS_GATEWAYS)
+        self.alpha = alpha
+        self.failure_penalty = failure_penalty
+        self.latency = {gateway: None for gateway in self.gateways}
+        self.lock = threading.Lock()
+
+    # Function to list gateways fastest first; unmeasured ones keep their initial order up front
+    def ranked(self):
+        with self.lock:
+            order = {gateway: index for index, gateway in enumerate(self.gateways)}
+            return sorted(self.gateways, key=lambda g: (self.latency[g] or 0.0, order[g]))
+
+    # Function to fold one observation into a gateway's average
+    def record(self, gateway, seconds):
+        with self.lock:
+            previous = self.latency.get(gateway)
+            self.latency[gateway] = seconds if previous is None else (
+                self.alpha * seconds + (1 - self.alpha) * previous
+            )
+
+    # Function to push a failing gateway down the ranking
+    def record_failure(self, gateway):
+        self.record(gateway, self.failure_penalty)
+
+
+gateway_ranker = GatewayRanker()
+onchfs_ranker = GatewayRanker(ONCHFS_GATEWAYS)
+
+
+# Function to GET `route` (e.g. "ipfs/<cid>/<path>") from a list of gateways, failing over between them
+# `gateways` overrides the ranked list, e.g. to pin a private or local gateway
+# Returns (response, gateway used); raises the last error if every gateway fails
+def get_from_gateways(route, timeout=5, ranker=None, gateways=None, **kwargs):
+    ranker = ranker or gateway_ranker
+    last_error = None
+    for gateway in gateways or ranker.ranked():
+        url = f"{gateway}/{route}"
+        started = time.perf_counter()
+        try:
+            # A throttled gateway is skipped rather than waited for
+            response = get(url, retries=0, timeout=timeout, throttle_retries=0, **kwargs)
+        except requests.exceptions.RequestException as e:
+            # A 404 means the content is not there, not that the gateway is down
+            if e.response is not None and e.response.status_code == 404:
+                ranker.record(gateway, time.perf_counter() - started)
+                raise
+            ranker.record_failure(gateway)
+            last_error = e
+            continue
+        ranker.record(gateway, time.perf_counter() - started)
+        annotate(gateway=gateway)
+        return response, gateway
+    raise last_error
+
+
+# Function to GET IPFS content by CID and path, failing over between gateways
+def get_ipfs(cid, path="", timeout=5, ranker=None, gateways=None, **kwargs):
+    route = f"ipfs/{cid}/{path}" if path else f"ipfs/{cid}"
+    return get_from_gateways(route, timeout, ranker or gateway_ranker, gateways, **kwargs)
+
+
+# Function to GET onchfs content by file hash and path, failing over between proxies
+def get_onchfs(file_hash, path="", timeout=5, ranker=None, gateways=None, **kwargs):
+    route = f"{file_hash}/{path}" if path else file_hash
+    return get_from_gateways(route, timeout, ranker or onchfs_ranker, gateways, **kwargs)
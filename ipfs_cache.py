@@ -0,0 +1,313 @@
+# Content-addressed on-disk cache for IPFS and onchfs fetches.
+# IPFS and onchfs content is immutable, so anything fetched once by CID (or file
+# hash) + path can be served from disk on every later run. Entries live in a
+# single SQLite file and the least recently used ones are evicted once the cache
+# grows past its size limit. The cache keeps a running byte total and writes the
+# last-access times of hits in batches, so neither a put nor a hit costs a
+# table scan or a commit of its own. Each URI scheme is a ContentScheme in SCHEMES; they
+# all share the cache and the gateway failover in http_client.
+# Download streams a body in chunks with a byte cap and skips binary content, so
+# callers can scan large bundles without holding them in memory as text.
+
+import atexit
+import posixpath
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+from crawl_metrics import annotate
+import http_client
+
+CACHE_PATH = "ipfs_cache.sqlite"
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Largest body a streamed download reads before it stops, and its chunk size
+MAX_FETCH_BYTES = 8 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# Bodies larger than this are streamed but not cached, so caching never holds a big bundle in memory
+CACHE_ENTRY_MAX_BYTES = 8 * 1024 * 1024
+
+# Eviction frees space down to this share of max_bytes, so a full cache does
+# not evict (and re-total) on every put
+CACHE_EVICT_TO = 0.9
+
+# Cache hits whose last_access update is written in one batch
+ACCESS_FLUSH_EVERY = 256
+
+# Content types and leading bytes of files that are never code worth scanning
+BINARY_TYPES = ("image/", "video/", "audio/", "font/", "application/octet-stream", "application/zip",
+                "application/gzip", "application/pdf", "application/wasm")
+BINARY_MAGIC = (b"\x89PNG", b"\xff\xd8\xff", b"GIF8", b"%PDF", b"PK\x03\x04", b"\x00asm", b"RIFF",
+                b"\x1f\x8b", b"OggS", b"ID3", b"glTF", b"wOFF", b"wOF2")
+
+
+# A content-addressed URI scheme (ipfs://, onchfs://) and the gateways serving it
+class ContentScheme:
+    def __init__(self, name, gateways, fetch, gateway_prefix="/", any_origin=False, key_prefix=""):
+        self.name = name
+        self.gateways = gateways
+        self.fetch = fetch
+        # Path prefix in gateway URLs, and whether any host using it counts (IPFS
+        # gateways all serve /ipfs/) or only the known gateways (onchfs proxies)
+        self.gateway_prefix = gateway_prefix
+        self.any_origin = any_origin
+        # Prepended to the root in cache keys so schemes cannot collide
+        self.key_prefix = key_prefix
+
+    # Function to split a scheme:// link or an HTTP gateway URL into (root, path)
+    # Returns None for anything that is not this scheme's content
+    def parse(self, url):
+        if not url:
+            return None
+        if url.startswith(self.name + "://"):
+            rest = url[len(self.name) + 3:]
+        else:
+            parsed = urlparse(url)
+            if parsed.scheme not in ("http", "https") or not parsed.path.startswith(self.gateway_prefix):
+                return None
+            if not self.any_origin and f"{parsed.scheme}://{parsed.netloc}" not in self.gateways:
+                return None
+            rest = parsed.path[len(self.gateway_prefix):]
+        rest = rest.split("?", 1)[0].split("#", 1)[0]
+        root, _, path = rest.partition("/")
+        if not root:
+            return None
+        path = posixpath.normpath("/" + path).lstrip("/")
+        return root, path
+
+    # Function to build the URL of a scheme:// link on the preferred gateway
+    def gateway_url(self, uri):
+        return self.gateways[0] + self.gateway_prefix + uri[len(self.name) + 3:]
+
+    # Function to get the gateways to try for a URL: the shared ranked list for
+    # scheme:// links and the known gateways, or only the URL's own origin otherwise
+    def gateways_for(self, url):
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https"):
+            return None
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        return None if origin in self.gateways else [origin]
+
+
+IPFS = ContentScheme("ipfs", http_client.IPFS_GATEWAYS, http_client.get_ipfs, "/ipfs/", any_origin=True)
+ONCHFS = ContentScheme("onchfs", http_client.ONCHFS_GATEWAYS, http_client.get_onchfs, key_prefix="onchfs:")
+
+# Schemes tried in order when a URL comes in; add a ContentScheme here to support another one
+SCHEMES = [IPFS, ONCHFS]
+
+
+# Function to find the scheme serving a URL
+# Returns (scheme, root, path), or None for anything that is not content-addressed
+def parse_content_url(url):
+    for scheme in SCHEMES:
+        key = scheme.parse(url)
+        if key is not None:
+            return scheme, key[0], key[1]
+    return None
+
+
+# Function to turn an ipfs:// or onchfs:// link into an HTTP URL on its preferred gateway
+# Anything else is returned unchanged
+def gateway_url(uri):
+    for scheme in SCHEMES:
+        if uri.startswith(scheme.name + "://"):
+            return scheme.gateway_url(uri)
+    return uri
+
+
+class IPFSCache:
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                cid TEXT NOT NULL,
+                path TEXT NOT NULL,
+                content BLOB NOT NULL,
+                encoding TEXT,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (cid, path)
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS blobs_last_access ON blobs (last_access)")
+        self.db.commit()
+        # Running size of the table, so a put does not have to sum it
+        self.total_bytes = self._table_bytes()
+        # (cid, path) -> last hit time, not yet written to the table
+        self.accessed = {}
+
+    def _table_bytes(self):
+        return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    # Function to look up cached bytes, returning (content, encoding) or None
+    # The hit's last_access is written later, in a batch with other hits
+    def get(self, cid, path=""):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT content, encoding FROM blobs WHERE cid = ? AND path = ?", (cid, path)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.accessed[(cid, path)] = time.time()
+            if len(self.accessed) >= ACCESS_FLUSH_EVERY:
+                self._flush_accesses()
+                self.db.commit()
+            return bytes(row[0]), row[1]
+
+    # Function to store bytes for a CID + path and evict old entries if needed
+    def put(self, cid, path, content, encoding=None):
+        with self.lock:
+            previous = self.db.execute(
+                "SELECT size FROM blobs WHERE cid = ? AND path = ?", (cid, path)
+            ).fetchone()
+            self.db.execute(
+                "INSERT OR REPLACE INTO blobs (cid, path, content, encoding, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (cid, path, content, encoding, len(content), time.time()),
+            )
+            self.accessed.pop((cid, path), None)
+            self.total_bytes += len(content) - (previous[0] if previous else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+            self.db.commit()
+
+    # Function to write the pending last_access times of cache hits
+    def _flush_accesses(self):
+        if self.accessed:
+            self.db.executemany(
+                "UPDATE blobs SET last_access = ? WHERE cid = ? AND path = ?",
+                [(accessed, cid, path) for (cid, path), accessed in self.accessed.items()],
+            )
+            self.accessed = {}
+
+    # Function to drop least recently used entries until the cache is down to CACHE_EVICT_TO of max_bytes
+    def _evict(self):
+        self._flush_accesses()
+        # Re-total once per eviction, in case another process shares the file
+        self.total_bytes = self._table_bytes()
+        target = self.max_bytes * CACHE_EVICT_TO
+        while self.total_bytes > target:
+            oldest = self.db.execute(
+                "SELECT cid, path, size FROM blobs ORDER BY last_access ASC LIMIT 64"
+            ).fetchall()
+            if not oldest:
+                break
+            for cid, path, size in oldest:
+                if self.total_bytes <= target:
+                    break
+                self.db.execute("DELETE FROM blobs WHERE cid = ? AND path = ?", (cid, path))
+                self.total_bytes -= size
+
+    # Function to report hit/miss counters and current cache size
+    def stats(self):
+        with self.lock:
+            entries = self.db.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": self.total_bytes}
+
+    def close(self):
+        with self.lock:
+            self._flush_accesses()
+            self.db.commit()
+            self.db.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+# Function to get the process-wide cache, opening it on first use
+def get_default_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = IPFSCache(CACHE_PATH, CACHE_MAX_BYTES)
+            # Writes the last-access times of hits still waiting for a batch
+            atexit.register(_default_cache.close)
+        return _default_cache
+
+
+# Function to tell from a Content-Type header or the first bytes that a body is binary
+# Returns a short reason, or None for text
+def sniff_binary(content_type, head):
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type.startswith(BINARY_TYPES):
+        return content_type
+    if head.startswith(BINARY_MAGIC):
+        return "binary signature"
+    if b"\x00" in head[:1024]:
+        return "NUL bytes"
+    return None
+
+
+# Streams one URL in chunks, serving IPFS / onchfs content from the cache when possible
+# After chunks() is exhausted: `size` bytes were read, `truncated` is set if the
+# cap cut the body short, and `binary` holds the reason if it was skipped as binary
+class Download:
+    def __init__(self, url, timeout=5, max_bytes=None, cache=None):
+        self.url = url
+        self.timeout = timeout
+        self.max_bytes = max_bytes or MAX_FETCH_BYTES
+        self.cache = cache
+        self.size = 0
+        self.truncated = False
+        self.binary = None
+        self.encoding = None
+
+    # Function to yield the body chunk by chunk, stopping at the byte cap
+    # Raises requests.exceptions.RequestException like requests.get on failure
+    def chunks(self):
+        content_key = parse_content_url(self.url)
+        if content_key is not None:
+            scheme, root, path = content_key
+            cache = self.cache or get_default_cache()
+            cached = cache.get(scheme.key_prefix + root, path)
+            annotate(cache="hit" if cached is not None else "miss")
+            if cached is not None:
+                content, self.encoding = cached
+                yield from self._capped(content[i:i + CHUNK_SIZE] for i in range(0, len(content), CHUNK_SIZE))
+                return
+            response, _ = scheme.fetch(root, path, timeout=self.timeout, gateways=scheme.gateways_for(self.url),
+                                       stream=True)
+        else:
+            response = http_client.get(self.url, timeout=self.timeout, stream=True)
+
+        with response:
+            self.encoding = response.encoding
+            content_type = response.headers.get("Content-Type")
+            # Complete bodies up to CACHE_ENTRY_MAX_BYTES are kept for the cache
+            kept = [] if content_key is not None else None
+            for chunk in self._capped(response.iter_content(CHUNK_SIZE), content_type):
+                if kept is not None:
+                    kept.append(chunk)
+                    if self.size > CACHE_ENTRY_MAX_BYTES:
+                        kept = None
+                yield chunk
+            if kept is not None and not self.truncated and not self.binary:
+                cache.put(scheme.key_prefix + root, path, b"".join(kept), self.encoding)
+
+    # Function to apply binary sniffing and the byte cap to a stream of chunks
+    def _capped(self, chunks, content_type=None):
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if self.size == 0:
+                self.binary = sniff_binary(content_type, chunk)
+                if self.binary:
+                    annotate(status=f"skipped: {self.binary}")
+                    return
+            if self.size + len(chunk) > self.max_bytes:
+                chunk = chunk[:self.max_bytes - self.size]
+                self.truncated = True
+            self.size += len(chunk)
+            yield chunk
+            if self.truncated:
+                annotate(truncated=True)
+                return
@@ -0,0 +1,157 @@
+# Single-pass JavaScript library detector.
+# A body is scanned once for a small set of literal anchors; only at those positions
+# is the compiled signature table (every library pattern plus the external-script
+# URL pattern, as one alternation) tried. Scanning works on bytes and can be fed
+# chunk by chunk, so large bundles never need to be held in memory as one string.
+
+import re
+
+SEMVER = rb"(?P<v>\d+\.\d+\.\d+)"
+
+# (library, pattern) pairs; versioned patterns come before the bare file-name ones
+# so the version wins when both would match at the same position
+LIBRARY_SIGNATURES = [
+    ("p5.js", rb"p5@" + SEMVER),
+    ("p5.js", rb"p5(?:\.min)?\.js v" + SEMVER),
+    ("p5.js", rb"p5\.js/" + SEMVER + rb"/"),
+    ("p5.js", rb"p5(?:\.min)?\.js"),
+    ("three.js", rb"three@" + SEMVER),
+    ("three.js", rb"REVISION\s{0,4}=\s{0,4}[\"'](?P<v>\d{2,3})(?:dev)?[\"']"),
+    ("three.js", rb"three(?:\.module)?(?:\.min)?\.js"),
+    ("regl", rb"regl@" + SEMVER),
+    ("regl", rb"regl(?:\.min)?\.js"),
+    ("tone.js", rb"tone@" + SEMVER),
+    ("tone.js", rb"Tone(?:\.min)?\.js"),
+    ("d3", rb"d3@" + SEMVER),
+    ("d3", rb"d3(?:\.v\d)?(?:\.min)?\.js"),
+    ("paper.js", rb"paper@" + SEMVER),
+    ("paper.js", rb"paper(?:-full|-core)?(?:\.min)?\.js"),
+    ("matter-js", rb"matter-js@" + SEMVER),
+    ("matter-js", rb"matter(?:\.min)?\.js"),
+    ("chroma-js", rb"chroma-js@" + SEMVER),
+    ("chroma-js", rb"chroma(?:\.min)?\.js"),
+    ("twgl.js", rb"twgl\.js@" + SEMVER),
+    ("twgl.js", rb"twgl(?:-full)?(?:\.min)?\.js"),
+    ("hydra-synth", rb"hydra-synth@" + SEMVER),
+]
+
+# External script URLs are captured inside a lookahead so library signatures
+# inside the URL are still seen
+URL_PATTERN = rb"(?=(?P<url>https?://[^\"'\s<>]{1,500}\.js)(?!\w))"
+
+# Literal prefixes that every pattern above starts with; the scan only looks for these
+ANCHORS = [
+    b"p5", b"three", b"REVISION", b"regl", b"tone@", b"Tone", b"d3", b"paper",
+    b"matter", b"chroma", b"twgl", b"hydra-synth@", b"http",
+]
+
+# Longest text any single alternative can span; used as the overlap between chunks
+MAX_MATCH = 600
+
+
+# Function to compile every signature into one named-group alternation
+def _compile_signatures():
+    alternatives = []
+    for index, (_, pattern) in enumerate(LIBRARY_SIGNATURES):
+        pattern = pattern.replace(b"(?P<v>", f"(?P<s{index}v>".encode())
+        alternatives.append(f"(?P<s{index}>".encode() + pattern + b")")
+    alternatives.append(URL_PATTERN)
+    return re.compile(b"|".join(alternatives))
+
+
+SIGNATURE_PATTERN = _compile_signatures()
+ANCHOR_PATTERN = re.compile(b"|".join(re.escape(anchor) for anchor in ANCHORS))
+WORD_BYTES = frozenset(b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-")
+
+
+class LibraryScanner:
+    def __init__(self):
+        self.libraries = {}
+        self.urls = set()
+        self._tail = b""
+        self._pos = 0
+
+    # Function to try the signature table at an anchor and record what it matches
+    def _check(self, buffer, position):
+        # Signatures must start at a word boundary, so "mp5.js" or "xd3" are not hits
+        if position and buffer[position - 1] in WORD_BYTES:
+            return
+        match = SIGNATURE_PATTERN.match(buffer, position)
+        if match is None:
+            return
+        name = match.lastgroup
+        if name == "url":
+            self.urls.add(match.group("url").decode("utf-8", errors="replace"))
+            return
+        library = LIBRARY_SIGNATURES[int(name[1:])][0]
+        version = match.group(name + "v") if (name + "v") in match.re.groupindex else None
+        versions = self.libraries.setdefault(library, set())
+        if version:
+            versions.add(version.decode())
+
+    # Function to scan the next chunk of a body (bytes or str)
+    # Only matches that are complete are recorded; the tail is kept for the next chunk
+    def feed(self, chunk):
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8", errors="replace")
+        buffer = self._tail + chunk
+        cutoff = len(buffer) - MAX_MATCH
+        for anchor in ANCHOR_PATTERN.finditer(buffer, self._pos):
+            if anchor.start() >= cutoff:
+                break
+            self._check(buffer, anchor.start())
+
+        # Keep one byte before the next scan position for the word-boundary check
+        start = max(cutoff, self._pos)
+        keep = max(start - 1, 0)
+        self._tail = buffer[keep:]
+        self._pos = start - keep
+
+    # Function to scan whatever is left once the body has ended
+    def close(self):
+        for anchor in ANCHOR_PATTERN.finditer(self._tail, self._pos):
+            self._check(self._tail, anchor.start())
+        self._tail = b""
+        self._pos = 0
+
+    # Function to fold another scanner's findings into this one
+    def merge(self, other):
+        for library, versions in other.libraries.items():
+            self.libraries.setdefault(library, set()).update(versions)
+        self.urls |= other.urls
+
+    # Function to summarize results in the two CSV columns used by the crawlers
+    def summary(self):
+        p5_versions = self.libraries.get("p5.js")
+        if p5_versions:
+            p5_version_summary = " / ".join(sorted(p5_versions))
+        elif p5_versions is not None:
+            p5_version_summary = "p5.js (version unknown)"
+        else:
+            p5_version_summary = "No p5.js found"
+
+        others = []
+        for library, versions in sorted(self.libraries.items()):
+            if library == "p5.js":
+                continue
+            if versions:
+                others.extend(f"{library} {version}" for version in sorted(versions))
+            else:
+                others.append(library)
+        others.extend(sorted(self.urls))
+        other_libraries_summary = " / ".join(others) if others else "No other libraries found"
+        return p5_version_summary, other_libraries_summary
+
+
+# Function to detect libraries in an iterable of chunks without joining them
+def scan_chunks(chunks):
+    scanner = LibraryScanner()
+    for chunk in chunks:
+        scanner.feed(chunk)
+    scanner.close()
+    return scanner.summary()
+
+
+# Function to detect libraries in a complete body
+def detect_libraries(code_content):
+    return scan_chunks([code_content])
@@ -1,19 +1,41 @@
 #!/usr/bin/python3
 # Merged script: Collects data from fxhash, including random and latest generative tokens,
 # performs static analysis, and logs errors and library details.
+# By default only tokens newer than the last run are fetched and appended; the
+# token ID cursor is kept in fxhash_feed_state.json. Pass --full to rebuild.
 
 import requests
+import argparse
 import json
 import random
 import datetime
-import re
 import csv
 import os
-from lxml import etree
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from asset_graph import AssetResolver, write_manifest
+from fxhash_graphql import BatchTokenFetcher
+from crawl_metrics import annotate, traced, tracer
+import http_client
+import rate_limiter
+from ipfs_cache import gateway_url, get_default_cache
 
 # File name for CSV output
 csv_filename = "fxhash_data.csv"
 
+# JSON-lines file with each described token's dependency manifest
+manifest_filename = "fxhash_dependencies.jsonl"
+
+# Resolver shared by every token so common assets are analyzed once per run
+resolver = AssetResolver()
+
+# File holding the feed cursor between runs
+state_filename = "fxhash_feed_state.json"
+
+# Page size for the GenerativeTokens query, and how many pages one run may read
+FEED_PAGE_SIZE = 20
+FEED_MAX_PAGES = 50
+
 # Function to create the CSV file and write headers
 def create_csv():
     with open(csv_filename, mode='w', newline='', encoding='utf-8') as file:
@@ -31,14 +53,15 @@ def write_to_csv(data):
         writer = csv.writer(file)
         writer.writerow(data)
 
-# GraphQL Query to get the latest generative tokens
-def get_latest_generative_tokens():
+# GraphQL Query to get the latest generative tokens, newest (highest ID) first
+# Raises requests.exceptions.RequestException or ValueError if the page cannot be read
+def get_latest_generative_tokens(skip=0, take=FEED_PAGE_SIZE):
     query = {
         "operationName": "GenerativeTokens",
         "variables": {
-            "skip": 0,
-            "take": 20,
-            "sort": {"mintOpensAt": "DESC"},
+            "skip": skip,
+            "take": take,
+            "sort": {"id": "DESC"},
             "filters": {"flag_in": ["CLEAN", "NONE"]}
         },
         "query": """
@@ -49,6 +72,7 @@ def get_latest_generative_tokens():
             generativeUri
             slug
             flag
+            mintOpensAt
             author {
               name
             }
@@ -57,83 +81,120 @@ def get_latest_generative_tokens():
         """
     }
 
-    response = requests.post("https://api.fxhash.xyz/graphql", json=query)
+    response = http_client.post("https://api.fxhash.xyz/graphql", json=query, timeout=30)
 
     # Handle potential errors in response
     try:
-        return response.json()['data']['generativeTokens']
-    except KeyError:
-        print(f"Error fetching latest generative tokens: {response.status_code} - {response.text}")
-        return []
+        tokens = response.json()['data']['generativeTokens']
+    except (KeyError, TypeError, ValueError):
+        tokens = None
+    if tokens is None:
+        raise ValueError(f"{response.status_code} - {response.text[:200]}")
+    return tokens
+
+# Function to find the highest token ID already in the feed CSV
+def last_token_id_in_csv(path=csv_filename):
+    if not os.path.exists(path):
+        return None
+    with open(path, newline='', encoding='utf-8') as file:
+        ids = [row["Artwork Link"].rsplit("/", 1)[-1] for row in csv.DictReader(file)]
+    return max((int(i) for i in ids if i.isdigit()), default=None)
+
+# Function to load the feed cursor: the highest token ID processed so far
+# Token IDs grow with creation order, unlike mintOpensAt, which can be scheduled
+# ahead. State files from the older mintOpensAt cursor are migrated from the CSV.
+def load_state(path=state_filename):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as file:
+        state = json.load(file)
+    if "id" not in state:
+        last_id = last_token_id_in_csv()
+        return None if last_id is None else {"id": last_id}
+    return {"id": int(state["id"])}
+
+# Function to save the feed cursor; written to a temporary file first so a crash
+# never leaves a half-written state behind
+def save_state(state, path=state_filename):
+    temporary = path + ".tmp"
+    with open(temporary, mode='w', encoding='utf-8') as file:
+        json.dump({"id": state["id"], "updated": datetime.datetime.now(datetime.timezone.utc).isoformat()}, file)
+    os.replace(temporary, path)
+
+# Function to move the cursor to the highest of the given token IDs
+def advance_state(state, tokens):
+    if not tokens:
+        return state
+    newest = max(int(token["id"]) for token in tokens)
+    if state is not None and newest < state["id"]:
+        return state
+    return {"id": newest}
+
+# Function to tell whether a token was already covered by a previous run
+# Tokens without a mintOpensAt are ordinary new tokens here; only the ID matters
+def is_processed(token, state):
+    return int(token["id"]) <= state["id"]
+
+# Function to get the tokens created since the cursor, newest first
+# Pages through GenerativeTokens until it reaches a token an earlier run processed
+# Without a cursor only the first page is read, as in a full run
+# Any page that fails raises, so the caller never moves the cursor past unread tokens
+def get_new_generative_tokens(state, page_size=FEED_PAGE_SIZE, max_pages=FEED_MAX_PAGES):
+    if state is None:
+        return get_latest_generative_tokens(0, page_size)
+    new_tokens = []
+    for page in range(max_pages):
+        tokens = get_latest_generative_tokens(page * page_size, page_size)
+        for token in tokens:
+            if is_processed(token, state):
+                return new_tokens
+            new_tokens.append(token)
+        if len(tokens) < page_size:
+            return new_tokens
+    print(f"Stopped after {max_pages} pages without reaching the last processed token")
+    return new_tokens
 
 # Function to get a random generative token
+# All candidate IDs are looked up in one batched GraphQL request
 def get_random_token(maxtokenid):
-    randomtoken = None
-    for i in range(1, 10):
-        randfxhash = random.randint(0, maxtokenid)
-        r2 = requests.post("https://api.fxhash.xyz/graphql", json={
-            "operationName": "GenerativeTokenFeatures",
-            "variables": {"id": randfxhash},
-            "query": """
-            query GenerativeTokenFeatures($id: Float) {
-              generativeToken(id: $id) {
-                name
-                generativeUri
-                features
-              }
-            }
-            """
-        })
-        if r2.json()['data']['generativeToken'] is not None:
-            randomtoken = r2.json()['data']['generativeToken']
+    candidates = [random.randint(0, maxtokenid) for i in range(1, 10)]
+    tokens = BatchTokenFetcher(batch_size=len(candidates)).fetch_raw(candidates)
+    for randfxhash in candidates:
+        if tokens.get(randfxhash) is not None:
+            randomtoken = tokens[randfxhash]
             randomtoken["id"] = randfxhash
-            break
-    return randomtoken
+            return randomtoken
+    return None
 
 # Static analysis function to find scripts and libraries
+# Walks the bundle's whole script tree and detects libraries across all of it
+@traced("static_analysis")
 def static_analysis(token):
     if "generativeUri" not in token:
         return {"status": "No URI found", "http_link": None}
 
-    rooturl = token["generativeUri"].replace("ipfs://", "https://gateway.fxhash2.xyz/ipfs/")
+    rooturl = gateway_url(token["generativeUri"])
     try:
-        data = requests.get(rooturl)
-        document = etree.HTML(data.text)
-        scripts = document.xpath("//script[@src]/@src")
-
-        scripts_info = []
-        version_pattern = re.compile(r'v\d+(\.\d+)*')
-        p5_version = None
-        other_libraries = []
-
-        for script in scripts:
-            script_info = script
-            if "p5" in script:
-                # Example to fetch version of p5.js
-                try:
-                    script_content = requests.get(rooturl + "/" + script).text
-                    p5_version = re.search(version_pattern, script_content)
-                    if p5_version:
-                        script_info += f" (p5.js version: {p5_version.group()})"
-                except Exception:
-                    script_info += " (p5.js version unknown)"
-            else:
-                other_libraries.append(script)
-
-            scripts_info.append(script_info)
-
-        return {
-            "status": "Success",
-            "http_link": rooturl,
-            "p5_version": p5_version.group() if p5_version else "N/A",
-            "other_libraries": ", ".join(other_libraries) if other_libraries else "None"
-        }
+        manifest = resolver.resolve(rooturl)
     except requests.exceptions.RequestException as e:
+        annotate(status=f"error: {e.__class__.__name__}")
         return {"status": "Error accessing IPFS content", "http_link": None}
 
+    annotate(bytes=manifest["unique_bytes"], assets=len(manifest["assets"]))
+    return {
+        "status": "Success",
+        "http_link": rooturl,
+        "p5_version": manifest["p5_versions"],
+        "other_libraries": manifest["other_libraries"],
+        "manifest": manifest
+    }
+
 # Function to describe the token for the CSV file
-def describe_token(token):
-    static_data = static_analysis(token)
+def describe_token(token, static_data=None):
+    if static_data is None:
+        static_data = static_analysis(token)
+    if "manifest" in static_data:
+        write_manifest(manifest_filename, token["id"], static_data["manifest"])
 
     # Gather all the link formats
     artifact_uri_http = f"https://gateway.fxhash2.xyz/ipfs/{token['id']}/artifactUri"
@@ -157,19 +218,45 @@ def describe_token(token):
     ])
 
 # Function to generate feed with both latest and random tokens
-def generate_fxhash_feed():
-    latest_tokens = get_latest_generative_tokens()
+# With a cursor only tokens created since the last run are described and appended
+# Returns the updated cursor (unchanged if nothing new was found)
+def generate_fxhash_feed(state=None):
+    latest_tokens = get_new_generative_tokens(state)
     if latest_tokens:
         maxtokenid = latest_tokens[0]['id']
         random_token = get_random_token(maxtokenid)
 
-        # Describe both latest and random tokens
-        if random_token:  # Check if a random token was found
-            describe_token(random_token)
-        for token in latest_tokens:
-            describe_token(token)
+        # Describe both latest and random tokens, analyzing their bundles concurrently
+        tokens = ([random_token] if random_token else []) + latest_tokens
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            analyses = list(executor.map(static_analysis, tokens))
+        for token, static_data in zip(tokens, analyses):
+            describe_token(token, static_data)
+    print(f"{len(latest_tokens)} new generative tokens")
+    return advance_state(state, latest_tokens)
 
 # Main execution
 if __name__ == "__main__":
-    create_csv()  # Create CSV file and headers
-    generate_fxhash_feed()
+    parser = argparse.ArgumentParser(description="Append new fxhash generative tokens to the feed CSV")
+    parser.add_argument("--full", action="store_true", help="recreate the CSV and ignore the saved cursor")
+    parser.add_argument("--state", default=state_filename, help="file holding the token ID cursor")
+    args = parser.parse_args()
+    tracer.stream_to("merge_codes_trace.json")
+
+    state = None if args.full else load_state(args.state)
+    if state is None or not os.path.exists(csv_filename):
+        create_csv()  # Create CSV file and headers
+        state = None
+    try:
+        state = generate_fxhash_feed(state)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        # Nothing was appended and the cursor stays put, so the next run retries these pages
+        print(f"Error fetching latest generative tokens: {e}")
+        sys.exit(1)
+    if state is not None:
+        save_state(state, args.state)
+    print(f"Bundle assets: {resolver.stats()}")
+    print(f"IPFS cache: {get_default_cache().stats()}")
+    print(f"Rate limits: {rate_limiter.stats()}")
+    tracer.print_summary()
+    tracer.write_json("merge_codes_trace.json")
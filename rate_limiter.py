@@ -0,0 +1,202 @@
+# Per-endpoint rate limiting and circuit breaking for the shared HTTP client.
+# Each fxhash host gets a token bucket. Its rate is halved on every 429, paused
+# for as long as Retry-After asks, and raised again step by step while requests
+# succeed, so throughput settles just under what the endpoint allows. A circuit
+# breaker per host stops sending traffic to an endpoint that keeps failing and
+# lets a single probe through once the cool-down has passed. The breaker counts
+# requests, not attempts: a request that exhausted its retries is one failure.
+
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import datetime
+import threading
+import time
+
+import requests
+
+from crawl_metrics import tracer
+
+# (requests per second to start at, burst size, ceiling) for each host
+ENDPOINT_LIMITS = {
+    "api.fxhash.xyz": (8.0, 8, 20.0),
+    "www.fxhash.xyz": (2.0, 4, 5.0),
+    "gateway.fxhash2.xyz": (20.0, 20, 50.0),
+    "gateway.ipfs.io": (10.0, 10, 30.0),
+    "onchfs.fxhash2.xyz": (20.0, 20, 50.0),
+}
+
+# Consecutive failures that open a host's circuit, and how long it stays open
+FAILURE_THRESHOLD = 5
+RESET_AFTER = 30.0
+
+# Pause used for a 429 that does not say how long to wait
+DEFAULT_RETRY_AFTER = 1.0
+
+
+# Raised instead of sending a request to a host whose circuit is open
+class CircuitOpenError(requests.exceptions.RequestException):
+    pass
+
+
+# Function to read a Retry-After header (seconds or an HTTP date) as seconds from now
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (moment - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, max_rate=None, min_rate=0.2):
+        self.rate = rate
+        self.burst = burst
+        self.max_rate = max_rate or rate
+        self.min_rate = min_rate
+        # Additive increase per success: back to the ceiling after ~50 good requests
+        self.step = self.max_rate / 50
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.throttled_count = 0
+        self.lock = threading.Lock()
+
+    # Function to take one token, returning how long the caller has to wait for it
+    def _reserve(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Tokens can go negative: each waiter reserves its own slot in the queue
+            self.tokens -= 1
+            wait = max(0.0, -self.tokens / self.rate)
+            return max(wait, self.paused_until - now)
+
+    # Function to block until a request may be sent; returns the seconds waited
+    def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    # Function to back off after a 429: halve the rate and pause for Retry-After
+    def throttled(self, retry_after=None):
+        with self.lock:
+            self.throttled_count += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            pause = DEFAULT_RETRY_AFTER if retry_after is None else retry_after
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            self.tokens = min(self.tokens, 0.0)
+
+    # Function to creep the rate back up after a request that was not throttled
+    def succeeded(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.step)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_after=RESET_AFTER):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.times_opened = 0
+        self.lock = threading.Lock()
+
+    # Function to tell whether a request may go out; after the cool-down one probe is let through
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.probing or time.monotonic() - self.opened_at < self.reset_after:
+                return False
+            self.probing = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.probing:
+                    self.times_opened += 1
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half-open" if self.probing else "open"
+
+
+# Token bucket plus circuit breaker for one host
+class EndpointLimit:
+    def __init__(self, host, rate, burst, max_rate):
+        self.host = host
+        self.bucket = TokenBucket(rate, burst, max_rate)
+        self.breaker = CircuitBreaker()
+
+    # Function to let a request start; raises CircuitOpenError while the circuit is open
+    # Every admitted request must be resolved with finished(), whatever its outcome
+    def admit(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {self.host} after repeated failures")
+
+    # Function to wait for a slot for one attempt of an admitted request
+    def acquire(self):
+        waited = self.bucket.acquire()
+        if waited > 0:
+            tracer.record("rate_limit_wait", waited, host=self.host)
+
+    def throttled(self, retry_after=None):
+        self.bucket.throttled(retry_after)
+
+    # Function to creep the rate back up after an attempt that was not throttled
+    def succeeded(self):
+        self.bucket.succeeded()
+
+    # Function to record the outcome of a whole request with the circuit breaker
+    def finished(self, healthy):
+        if healthy:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+
+_limits = {}
+_limits_lock = threading.Lock()
+
+
+# Function to get the limit for a URL's host, or None for hosts without one
+def limit_for(url):
+    host = urlparse(url).hostname
+    if host not in ENDPOINT_LIMITS:
+        return None
+    with _limits_lock:
+        if host not in _limits:
+            _limits[host] = EndpointLimit(host, *ENDPOINT_LIMITS[host])
+        return _limits[host]
+
+
+# Function to report the current rate, 429 count and circuit state per host
+def stats():
+    with _limits_lock:
+        limits = dict(_limits)
+    return {
+        host: {"rate": round(limit.bucket.rate, 2), "throttled": limit.bucket.throttled_count,
+               "circuit": limit.breaker.state(), "times_opened": limit.breaker.times_opened}
+        for host, limit in limits.items()
+    }
@@ -0,0 +1,100 @@
+# Pool of headless Chrome workers for the Run-button checkers.
+# Each worker process owns one driver and checks URLs handed out by a
+# multiprocessing pool. Worker processes (and their drivers) are replaced after
+# a fixed number of pages to keep Chrome's memory in check, and every result is
+# written to the CSV as soon as it comes back. An optional HTTP pre-check settles
+# clear-cut artworks first so only the ambiguous ones need a browser.
+
+from multiprocessing import Pool
+from multiprocessing.util import Finalize
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from webdriver_manager.chrome import ChromeDriverManager
+from run_button_precheck import precheck_artworks
+from crawl_metrics import tracer
+import csv
+import time
+
+RUN_BUTTON = (By.XPATH, "//button[contains(text(), 'Run')]")
+
+DEFAULT_ARGS = ("--disable-gpu", "--no-sandbox", "--disable-dev-shm-usage")
+
+# Per-process state set up by _init_worker: (check function, driver)
+_worker = None
+
+
+# Function to build Chrome options for a checker driver
+def make_options(headless=True, extra_args=()):
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument("--headless=new")
+    for arg in DEFAULT_ARGS + tuple(extra_args):
+        options.add_argument(arg)
+    return options
+
+
+# Function to start a Chrome driver from an already installed chromedriver
+def make_driver(driver_path, headless=True, extra_args=()):
+    return webdriver.Chrome(service=Service(driver_path), options=make_options(headless, extra_args))
+
+
+# Function run once in every worker process to start its driver
+def _init_worker(check, driver_path, headless, extra_args):
+    global _worker
+    driver = make_driver(driver_path, headless, extra_args)
+    # Quit Chrome when the pool retires this worker
+    Finalize(None, driver.quit, exitpriority=10)
+    _worker = (check, driver)
+
+
+# Function run in a worker process for every URL; returns (url, status, seconds)
+# Spans are recorded by the parent, since each worker has its own tracer
+def _check_url(artwork_url):
+    check, driver = _worker
+    started = time.perf_counter()
+    try:
+        status = check(driver, artwork_url)
+    except Exception as e:
+        status = f"Error: {e.__class__.__name__}"
+    return artwork_url, status, time.perf_counter() - started
+
+
+# Function to check many artworks across a pool of headless drivers
+# `check(driver, url)` must be a module-level function returning the status string
+def process_artworks_pooled(artwork_urls, check, output='artwork_button_check_results.csv',
+                            workers=4, pages_per_driver=25, headless=True, extra_args=(), precheck=True,
+                            trace='run_button_trace.json'):
+    tracer.stream_to(trace)
+    with open(output, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(["Artwork URL", "Status"])
+        file.flush()
+
+        if precheck:
+            decided, artwork_urls = precheck_artworks(artwork_urls)
+            writer.writerows(decided.items())
+            file.flush()
+        if not artwork_urls:
+            tracer.write_json(trace)
+            return
+
+        driver_path = ChromeDriverManager().install()
+        pool = Pool(
+            workers,
+            initializer=_init_worker,
+            initargs=(check, driver_path, headless, tuple(extra_args)),
+            maxtasksperchild=pages_per_driver,
+        )
+        try:
+            for artwork_url, status, seconds in pool.imap_unordered(_check_url, artwork_urls):
+                writer.writerow([artwork_url, status])
+                file.flush()
+                tracer.record("check_run_button", seconds, url=artwork_url,
+                              status="ok" if status == "Run button works" else status)
+                tracer.maybe_report()
+        finally:
+            pool.close()
+            pool.join()
+            tracer.print_summary()
+            tracer.write_json(trace)
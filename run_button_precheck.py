@@ -0,0 +1,109 @@
+# HTTP-only first pass for the Run-button check.
+# Looks up each token's generative URI, fetches the HTML over plain HTTP, checks
+# that every script it loads answers and that the fxhash snippet the Run button
+# relies on is present. Clear passes and clear failures are decided here; only
+# ambiguous tokens are handed on to a Selenium driver. Scripts are streamed with
+# the ipfs_cache.Download byte cap and scanned chunk by chunk; once the snippet
+# has been seen, the remaining scripts are only read far enough to show they exist.
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from urllib.parse import urljoin
+import re
+
+from lxml import etree
+import requests
+
+from asset_graph import directory_url, is_not_found
+from fxhash_graphql import BatchTokenFetcher
+from crawl_metrics import annotate, tracer
+from ipfs_cache import Download
+from updatedFxhash import artwork_id_from_url, ipfs_to_http
+
+PRECHECK_PASS = "Run button works (HTTP pre-check)"
+PRECHECK_HTML_MISSING = "Broken - generative HTML not found"
+PRECHECK_SCRIPT_MISSING = "Broken - script not found: {}"
+
+# Globals the fxhash snippet defines; the Run button only works when the project uses it
+SNIPPET_MARKERS = re.compile(rb"\$fx\b|\bfxrand\b|\bfxhash\b")
+
+# Bytes carried over between chunks so a marker split across two still matches
+MARKER_OVERLAP = 16
+
+
+# Function to stream a script and tell whether it contains the fxhash snippet
+# With `exists_only` the first chunk is enough: it shows the script is served
+# Raises requests.exceptions.RequestException if the script cannot be fetched
+def script_has_snippet(url, timeout=10, exists_only=False):
+    download = Download(url, timeout=timeout)
+    tail = b""
+    with closing(download.chunks()) as chunks:
+        for chunk in chunks:
+            if exists_only:
+                return False
+            window = tail + chunk
+            if SNIPPET_MARKERS.search(window):
+                return True
+            tail = window[-MARKER_OVERLAP:]
+    return False
+
+
+# Function to pre-check one generative URI
+# Returns a status string, or None when a browser is needed to decide
+def precheck_generative_uri(generative_uri, timeout=10):
+    if not generative_uri or generative_uri == "-":
+        return None
+    page_url = directory_url(ipfs_to_http(generative_uri)[1])
+
+    download = Download(page_url, timeout=timeout)
+    try:
+        html = b"".join(download.chunks())
+    except requests.exceptions.RequestException as e:
+        return PRECHECK_HTML_MISSING if is_not_found(e) else None
+    if download.binary or not html:
+        return None
+
+    document = etree.HTML(html)
+    if document is None:
+        return None
+    found = SNIPPET_MARKERS.search(html) is not None
+    for src in document.xpath("//script[@src]/@src"):
+        try:
+            found = script_has_snippet(urljoin(page_url, src), timeout, exists_only=found) or found
+        except requests.exceptions.RequestException as e:
+            if is_not_found(e):
+                return PRECHECK_SCRIPT_MISSING.format(src)
+            return None
+
+    return PRECHECK_PASS if found else None
+
+
+# Function to pre-check many artwork pages
+# Returns ({url: status} for decided artworks, [urls that still need Selenium])
+def precheck_artworks(artwork_urls, workers=8, fetcher=None):
+    fetcher = fetcher or BatchTokenFetcher()
+    ids = {url: artwork_id_from_url(url) for url in artwork_urls}
+    tokens = fetcher.fetch([i for i in ids.values() if i is not None])
+
+    def check(url):
+        with tracer.span("http_precheck", url=url):
+            token = tokens.get(ids[url])
+            if not token:
+                return None
+            status = precheck_generative_uri(token.get("generativeUri"))
+            if status is None and token.get("artifactUri", "-") != "-":
+                status = precheck_generative_uri(token["artifactUri"])
+            annotate(result=status or "escalated")
+            return status
+
+    decided = {}
+    escalate = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for url, status in zip(artwork_urls, executor.map(check, artwork_urls)):
+            if status is None:
+                escalate.append(url)
+            else:
+                decided[url] = status
+    print(f"HTTP pre-check decided {len(decided)} of {len(artwork_urls)} artworks, "
+          f"{len(escalate)} escalated to Selenium")
+    return decided, escalate
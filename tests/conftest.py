@@ -0,0 +1,59 @@
+# Shared fixtures: every test talks to a local benchmark_suite.ReplayServer,
+# never to fxhash or a real IPFS gateway.
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark_suite
+import http_client
+import ipfs_cache
+import rate_limiter
+
+
+# Function to build a generative token the way the replay GraphQL endpoint serves it
+# `cid` sets the generativeUri's root; any other field can be overridden
+def make_token(artwork_id, cid=None, **fields):
+    uri = f"ipfs://{cid or f'QmToken{artwork_id}'}"
+    token = {
+        "id": artwork_id, "name": f"Token {artwork_id}", "generativeUri": uri, "slug": str(artwork_id),
+        "displayUri": f"ipfs://QmDisplay{artwork_id}", "thumbnailUri": f"ipfs://QmThumb{artwork_id}",
+        "flag": "CLEAN", "mintOpensAt": "2024-01-01T00:00:00Z", "author": {"name": "test"},
+        "metadata": {"description": f"Token {artwork_id}",
+                     "artifactUri": f"{uri}/?fxhash=oo{artwork_id}&fxiteration=1"},
+    }
+    token.update(fields)
+    return token
+
+
+# Function to serve a token from the replay server: its GraphQL entry and, with
+# `bundle`, a runnable IPFS bundle and an artwork page for the scrape fallback
+def add_token(replay, artwork_id, cid=None, bundle=True, **fields):
+    token = make_token(artwork_id, cid, **fields)
+    replay.store.tokens[artwork_id] = token
+    if bundle:
+        benchmark_suite.add_generative_bundle(replay.store, token["generativeUri"], "1.9.0", 1, runnable=True)
+        replay.store.add("www.fxhash.xyz", f"/generative/{artwork_id}", benchmark_suite.artwork_page(token))
+    return token
+
+
+# Replay server with an empty fixture store; all known hosts are redirected to it
+# and rate limits, circuit breakers and the IPFS cache start fresh for each test
+@pytest.fixture
+def replay(monkeypatch, tmp_path):
+    store = benchmark_suite.FixtureStore()
+    server = benchmark_suite.ReplayServer(store).start()
+    monkeypatch.setattr(http_client, "HOST_OVERRIDES", {})
+    http_client.redirect_hosts(server.url)
+    monkeypatch.setattr(http_client, "backoff_sleep", lambda *args, **kwargs: None)
+    monkeypatch.setattr(rate_limiter, "_limits", {})
+    monkeypatch.setattr(rate_limiter, "ENDPOINT_LIMITS",
+                        {host: (1000.0, 1000, 1000.0) for host in rate_limiter.ENDPOINT_LIMITS})
+    monkeypatch.setattr(rate_limiter, "DEFAULT_RETRY_AFTER", 0.0)
+    monkeypatch.setattr(ipfs_cache, "_default_cache", ipfs_cache.IPFSCache(str(tmp_path / "ipfs_cache.sqlite")))
+    monkeypatch.chdir(tmp_path)
+    yield server
+    server.stop()
@@ -0,0 +1,91 @@
+import benchmark_suite
+import http_client
+from asset_graph import AssetResolver
+
+CDN_P5 = "https://cdn.jsdelivr.net/npm/p5@1.4.0/lib/p5.min.js"
+
+
+# Function to serve a token directory on every gateway: {path: body}, "" being index.html
+def add_directory(replay, cid, files):
+    for host in benchmark_suite.GATEWAY_HOSTS:
+        for path, body in files.items():
+            if path == "":
+                replay.store.add(host, f"/ipfs/{cid}", body)
+                replay.store.add(host, f"/ipfs/{cid}/", body)
+            else:
+                replay.store.add(host, f"/ipfs/{cid}/{path}", body, content_type="application/javascript")
+
+
+def bundle(cid, shared_gateway):
+    return {
+        "": f'<html><head><script src="./sketch.js"></script><script src="{CDN_P5}"></script>'
+            f'<script src="https://{shared_gateway}/ipfs/QmShared/noise.js"></script>'
+            '<script type="module">import { draw } from "./src/main.js";</script></head></html>',
+        "sketch.js": "function setup(){createCanvas(400,400)}",
+        "src/main.js": 'import { grid } from "../lib/grid.js";\nexport const draw = () => import("./lazy.js");',
+        "src/lazy.js": "export default 1;",
+        "lib/grid.js": "export const grid = [];",
+    }
+
+
+def test_relative_paths_and_es_imports_are_followed(replay):
+    add_directory(replay, "QmA", bundle("QmA", "gateway.fxhash2.xyz"))
+    add_directory(replay, "QmShared", {"noise.js": "var noise = 1;"})
+    http_client.redirect_hosts(replay.url, ["cdn.jsdelivr.net"])
+    replay.store.add("cdn.jsdelivr.net", "/npm/p5@1.4.0/lib/p5.min.js", "/*! p5.js v1.4.0 */",
+                     content_type="application/javascript")
+
+    resolver = AssetResolver()
+    manifest = resolver.resolve("https://gateway.fxhash2.xyz/ipfs/QmA")
+    resolver.close()
+
+    base = "https://gateway.fxhash2.xyz/ipfs/QmA/"
+    statuses = {asset["url"]: asset["status"] for asset in manifest["assets"]}
+    assert statuses == {
+        base: "ok", base + "sketch.js": "ok", base + "src/main.js": "ok", base + "src/lazy.js": "ok",
+        base + "lib/grid.js": "ok", CDN_P5: "ok", "https://gateway.fxhash2.xyz/ipfs/QmShared/noise.js": "ok",
+    }
+    parents = {asset["url"]: asset["parent"] for asset in manifest["assets"]}
+    assert parents[base + "lib/grid.js"] == base + "src/main.js"
+    assert parents[base + "src/lazy.js"] == base + "src/main.js"
+    assert manifest["p5_versions"] == "1.4.0"
+
+
+def test_assets_shared_by_tokens_are_downloaded_once(replay):
+    add_directory(replay, "QmA", bundle("QmA", "gateway.fxhash2.xyz"))
+    # Token B loads the shared file through another gateway
+    add_directory(replay, "QmB", bundle("QmB", "gateway.ipfs.io"))
+    add_directory(replay, "QmShared", {"noise.js": "var noise = 1;"})
+    http_client.redirect_hosts(replay.url, ["cdn.jsdelivr.net"])
+    replay.store.add("cdn.jsdelivr.net", "/npm/p5@1.4.0/lib/p5.min.js", "/*! p5.js v1.4.0 */",
+                     content_type="application/javascript")
+
+    resolver = AssetResolver()
+    first = resolver.resolve("https://gateway.fxhash2.xyz/ipfs/QmA")
+    second = resolver.resolve("https://gateway.fxhash2.xyz/ipfs/QmB")
+    resolver.close()
+
+    assert len(first["assets"]) == len(second["assets"]) == 7
+    # Five files of each token's own directory, plus the CDN build and the shared file once
+    assert resolver.stats()["fetched"] == 5 + 5 + 2
+    assert resolver.stats()["reused"] == 2
+    assert replay.take_counts()[0]["cdn.jsdelivr.net"] == 1
+    # Identical files in both directories are analyzed once
+    assert resolver.stats()["distinct"] < resolver.stats()["fetched"]
+
+
+def test_failed_downloads_are_retried_by_the_next_token(replay):
+    http_client.redirect_hosts(replay.url, ["cdn.jsdelivr.net"])
+    replay.store.add("cdn.jsdelivr.net", "/npm/p5@1.4.0/lib/p5.min.js", "Not Found", status=404)
+    add_directory(replay, "QmA", {"": f'<script src="{CDN_P5}"></script>'})
+    resolver = AssetResolver()
+    first = resolver.resolve("https://gateway.fxhash2.xyz/ipfs/QmA")
+
+    replay.store.add("cdn.jsdelivr.net", "/npm/p5@1.4.0/lib/p5.min.js", "/*! p5.js v1.4.0 */",
+                     content_type="application/javascript")
+    add_directory(replay, "QmB", {"": f'<script src="{CDN_P5}"></script>'})
+    second = resolver.resolve("https://gateway.fxhash2.xyz/ipfs/QmB")
+    resolver.close()
+
+    assert first["assets"][-1]["status"] == "missing"
+    assert second["assets"][-1]["status"] == "ok"
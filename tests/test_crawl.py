@@ -0,0 +1,70 @@
+import asyncio
+import csv
+
+from conftest import add_token
+from crawl_checkpoint import CheckpointWriter, manifest_path, read_rows
+from updatedFxhash import CSV_COLUMNS, crawl_rows, crawl_to_csv
+
+
+# Tokens 1-8: every third one is unknown to GraphQL and only has a page to scrape,
+# and token 5 has neither, so its page request fails
+def add_fixtures(replay):
+    for artwork_id in range(1, 9):
+        if artwork_id == 5:
+            replay.store.tokens[artwork_id] = None
+            replay.store.add("www.fxhash.xyz", "/generative/5", "Internal Server Error", status=500)
+            continue
+        add_token(replay, artwork_id)
+        if artwork_id % 3 == 0:
+            replay.store.tokens[artwork_id] = None
+
+
+async def collect(artwork_ids, **kwargs):
+    return [pair async for pair in crawl_rows(artwork_ids, **kwargs)]
+
+
+def test_crawl_rows_keeps_id_and_column_order(replay):
+    add_fixtures(replay)
+    # Random latency makes requests finish out of order
+    replay.jitter_ms = 40
+    results = asyncio.run(collect(range(1, 9), window=4))
+
+    assert [artwork_id for artwork_id, _ in results] == list(range(1, 9))
+    assert all(len(row) == len(CSV_COLUMNS) for _, row in results)
+    rows = dict(results)
+    assert rows[5][0].startswith("Request Error")
+    for artwork_id in (1, 2, 3, 4, 6, 7, 8):
+        row = dict(zip(CSV_COLUMNS, rows[artwork_id]))
+        assert row["Link Status"] == "working"
+        assert row["Description"] == f"Token {artwork_id}"
+        if artwork_id % 3:
+            assert row["IPFS Link"] == f"https://gateway.fxhash2.xyz/ipfs/QmToken{artwork_id}"
+        assert row["Generative URI fxhash"] == f"https://gateway.fxhash2.xyz/ipfs/QmToken{artwork_id}"
+        assert row["Display URI fxhash"] == f"https://gateway.fxhash2.xyz/ipfs/QmDisplay{artwork_id}"
+
+
+def test_resumed_crawl_matches_an_uninterrupted_one(replay):
+    add_fixtures(replay)
+    with CheckpointWriter("full.csv", CSV_COLUMNS, resume=False) as writer:
+        asyncio.run(crawl_to_csv(1, 8, writer))
+
+    with CheckpointWriter("resumed.csv", CSV_COLUMNS, resume=False) as writer:
+        asyncio.run(crawl_to_csv(1, 4, writer))
+    # Crash while writing row 5: half a CSV row and a torn manifest line
+    with open("resumed.csv", mode='a', newline='', encoding='utf-8') as file:
+        file.write('working,"Token 5 half')
+    with open(manifest_path("resumed.csv"), mode='a', encoding='utf-8') as file:
+        file.write("5,1")
+    replay.take_counts()
+
+    with CheckpointWriter("resumed.csv", CSV_COLUMNS) as writer:
+        assert writer.completed == {1, 2, 3, 4}
+        asyncio.run(crawl_to_csv(1, 8, writer))
+
+    assert list(read_rows("resumed.csv", CSV_COLUMNS)) == list(read_rows("full.csv", CSV_COLUMNS))
+    with open("resumed.csv", newline='', encoding='utf-8') as file:
+        assert list(csv.reader(file)) == [CSV_COLUMNS] + [row for _, row in read_rows("full.csv", CSV_COLUMNS)]
+    # Only tokens 5-8 were fetched again
+    pages = replay.take_counts()[0].get("www.fxhash.xyz", 0)
+    # Token 5 page: first try plus two retries; token 6 page: one scrape
+    assert pages == 3 + 1
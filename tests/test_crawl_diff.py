@@ -0,0 +1,125 @@
+import asyncio
+import csv
+import os
+
+import benchmark_suite
+import crawl_diff
+from conftest import add_token
+from crawl_checkpoint import CheckpointWriter, read_rows
+from updatedFxhash import CSV_COLUMNS, crawl_to_csv
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def crawl(start_id, end_id, output):
+    with CheckpointWriter(output, CSV_COLUMNS, resume=False) as writer:
+        asyncio.run(crawl_to_csv(start_id, end_id, writer))
+
+
+def rows(output):
+    return dict(read_rows(output, CSV_COLUMNS))
+
+
+def test_only_new_and_changed_tokens_are_reanalyzed(replay):
+    for artwork_id in range(1, 5):
+        add_token(replay, artwork_id, f"QmOriginal{artwork_id}")
+    crawl(1, 4, "out.csv")
+    before = rows("out.csv")
+    replay.take_counts()
+
+    add_token(replay, 2, "QmChanged2")
+    add_token(replay, 5, "QmOriginal5")
+    counts = asyncio.run(crawl_diff.diff_crawl(1, 5, "out.csv"))
+
+    assert counts == {"unchanged": 3, "changed": 1, "new": 1}
+    after = rows("out.csv")
+    assert list(after) == [1, 2, 3, 4, 5]
+    assert all(after[i] == before[i] for i in (1, 3, 4))
+    assert after[2][CSV_COLUMNS.index("Generative URI fxhash")].endswith("/ipfs/QmChanged2")
+    with open(crawl_diff.recheck_path("out.csv"), encoding='utf-8') as file:
+        assert file.read().split() == ["https://www.fxhash.xyz/generative/2", "https://www.fxhash.xyz/generative/5"]
+    # One GraphQL batch, no page fetches, and bundle requests for the two re-analyzed tokens only
+    requests_made = replay.take_counts()[0]
+    assert requests_made["api.fxhash.xyz"] == 1
+    assert "www.fxhash.xyz" not in requests_made
+
+
+def test_failed_metadata_lookup_keeps_previous_rows(replay):
+    for artwork_id in range(1, 4):
+        add_token(replay, artwork_id, f"QmOriginal{artwork_id}")
+    crawl(1, 3, "out.csv")
+    before = rows("out.csv")
+
+    replay.graphql = lambda body: {"errors": [{"message": "internal error"}]}
+    counts = asyncio.run(crawl_diff.diff_crawl(1, 3, "out.csv"))
+
+    assert counts == {"unverified": 3}
+    assert rows("out.csv") == before
+
+
+def test_failed_reanalysis_does_not_replace_a_working_row(replay):
+    for artwork_id in range(1, 3):
+        add_token(replay, artwork_id, f"QmOriginal{artwork_id}")
+    crawl(1, 2, "out.csv")
+    before = rows("out.csv")
+
+    # The token disappears from the API and its page starts failing
+    replay.store.tokens[2] = None
+    replay.store.add("www.fxhash.xyz", "/generative/2", "Internal Server Error", status=500)
+    counts = asyncio.run(crawl_diff.diff_crawl(1, 2, "out.csv"))
+
+    assert counts == {"unchanged": 1, "missing": 1, "failed": 1}
+    assert rows("out.csv") == before
+
+
+def test_escaped_query_strings_are_not_a_cid_change():
+    # Scraped rows store "\u0026" where GraphQL returns "&"; only the CID matters
+    with open(os.path.join(REPO_DIR, "fxhash_artwork_analysis.csv"), newline='', encoding='utf-8') as file:
+        working = [row for row in csv.DictReader(file) if row["Link Status"] == "working"]
+    assert working
+    for row in working:
+        token = {uri_type: benchmark_suite.to_ipfs_uri(row[column].replace("\\u0026", "&")) or "-"
+                 for uri_type, column in crawl_diff.URI_COLUMNS.items()}
+        assert crawl_diff.classify(token, [row[column] for column in CSV_COLUMNS]) == "unchanged"
+
+
+def test_legacy_csv_is_numbered_from_its_own_start(replay):
+    for artwork_id in range(1, 6):
+        add_token(replay, artwork_id, f"QmOriginal{artwork_id}")
+    crawl(1, 5, "out.csv")
+    before = rows("out.csv")
+    # An output from before checkpoint manifests existed
+    os.remove(crawl_diff.manifest_path("out.csv"))
+    replay.take_counts()
+
+    add_token(replay, 4, "QmChanged4")
+    counts = asyncio.run(crawl_diff.diff_crawl(3, 5, "out.csv", previous_start_id=1))
+
+    # Rows 1-2 are outside the range: kept, but not part of the report
+    assert counts == {"unchanged": 2, "changed": 1}
+    after = rows("out.csv")
+    assert list(after) == [1, 2, 3, 4, 5]
+    assert all(after[i] == before[i] for i in (1, 2, 3, 5))
+    assert after[4][CSV_COLUMNS.index("Generative URI fxhash")].endswith("/ipfs/QmChanged4")
+
+
+def test_report_share_covers_only_the_range(replay, capsys):
+    crawl_diff.print_report(crawl_diff.Counter({"unchanged": 2, "changed": 1}), "out.csv")
+    assert "skipped 2 of 3" in capsys.readouterr().out
+
+
+def test_code_fetch_errors_are_retried(replay):
+    add_token(replay, 1, "QmOriginal1")
+    # Token 2's page works but its code was never pinned
+    add_token(replay, 2, "QmUnpinned2", bundle=False)
+    crawl(1, 2, "out.csv")
+    p5_column = CSV_COLUMNS.index("p5.js Versions")
+    assert rows("out.csv")[2][0] == "working"
+    assert rows("out.csv")[2][p5_column].startswith(crawl_diff.CODE_FETCH_ERROR)
+
+    benchmark_suite.add_generative_bundle(replay.store, "ipfs://QmUnpinned2", "1.9.0", 1, runnable=True)
+    counts = asyncio.run(crawl_diff.diff_crawl(1, 2, "out.csv"))
+
+    assert counts == {"unchanged": 1, "errored": 1}
+    # The crawl scans index.html only, which loads p5 without naming its version
+    assert rows("out.csv")[2][p5_column] == "p5.js (version unknown)"
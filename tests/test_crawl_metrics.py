@@ -0,0 +1,36 @@
+import json
+
+from crawl_metrics import Tracer
+
+
+def test_percentiles_come_from_a_bounded_sample():
+    tracer = Tracer(sample_size=500)
+    for i in range(20000):
+        tracer.record("fetch", (i % 1000) / 1000)
+
+    assert len(tracer.durations["fetch"].values) == 500
+    stats = tracer.summary()["fetch"]
+    assert stats["count"] == 20000
+    assert abs(stats["p50"] - 0.5) < 0.1
+    assert stats["p99"] > 0.9
+
+
+def test_spans_are_streamed_to_the_trace_file(tmp_path):
+    path = str(tmp_path / "trace.json")
+    tracer = Tracer()
+    tracer.stream_to(path)
+    tracer.record("fetch", 0.25, bytes=10)
+    with tracer.span("parse") as span:
+        span["gateway"] = "https://gateway.fxhash2.xyz"
+    tracer.record("fetch", 0.5, status="error: Timeout")
+    tracer.write_json(path)
+
+    with open(path, encoding='utf-8') as file:
+        lines = [json.loads(line) for line in file]
+    assert lines[0] == {"started": tracer.started}
+    assert [line["stage"] for line in lines[1:-1]] == ["fetch", "parse", "fetch"]
+    assert lines[2]["gateway"] == "https://gateway.fxhash2.xyz"
+    summary = lines[-1]["summary"]
+    assert summary["fetch"]["count"] == 2 and summary["fetch"]["errors"] == 1
+    assert summary["fetch"]["bytes"] == 10
+    assert tracer.trace_file is None
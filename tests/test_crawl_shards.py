@@ -0,0 +1,80 @@
+import os
+import time
+
+import pytest
+
+from crawl_checkpoint import CheckpointWriter, read_rows
+from crawl_shards import Heartbeat, ShardQueue, merge, shard_output
+from updatedFxhash import CODE_FETCH_ERROR, CSV_COLUMNS
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return ShardQueue(str(tmp_path / "queue.sqlite"))
+
+
+def status(queue, shard_id):
+    return {row[0]: row[3:6] for row in queue.shards()}[shard_id]
+
+
+def test_expired_lease_is_taken_over(queue):
+    queue.add_range(1, 10, shard_size=5)
+    # A negative lease has already run out when the next worker asks
+    assert queue.lease("a", lease_seconds=-1) == (1, 1, 5)
+    assert queue.lease("b") == (1, 1, 5)
+    assert status(queue, 1) == ("leased", "b", 2)
+
+    assert not queue.heartbeat(1, "a")
+    assert not queue.complete(1, "a")
+    assert queue.complete(1, "b")
+    assert queue.lease("c") == (2, 6, 10)
+
+
+def test_release_fails_a_shard_after_max_attempts(queue):
+    queue.add_range(1, 5, shard_size=5)
+    for attempt in range(1, 4):
+        assert queue.lease("a") == (1, 1, 5)
+        queue.release(1, "a", RuntimeError(f"attempt {attempt}"), max_attempts=3)
+    assert status(queue, 1) == ("failed", None, 3)
+    assert queue.shards()[0][6] == "attempt 3"
+    assert queue.lease("a") is None
+
+    assert queue.retry_failed() == 1
+    assert queue.lease("a") == (1, 1, 5)
+
+
+def test_heartbeat_notices_a_lost_lease(queue):
+    queue.add_range(1, 5, shard_size=5)
+    queue.lease("a", lease_seconds=-1)
+    with Heartbeat(queue, 1, "a", lease_seconds=0.15) as heartbeat:
+        queue.lease("b")
+        deadline = time.monotonic() + 5
+        while not heartbeat.lost and time.monotonic() < deadline:
+            time.sleep(0.02)
+    assert heartbeat.lost
+    assert status(queue, 1) == ("leased", "b", 2)
+
+
+def row(status, description="-", p5="-"):
+    values = dict.fromkeys(CSV_COLUMNS, "-")
+    values.update({"Link Status": status, "Description": description, "p5.js Versions": p5})
+    return [values[column] for column in CSV_COLUMNS]
+
+
+def test_merge_prefers_successful_rows(tmp_path):
+    shard_dir = str(tmp_path / "shards")
+    os.makedirs(shard_dir)
+    # Two workers crawled shard 1-3 after a lease was lost
+    with CheckpointWriter(shard_output(shard_dir, 1, 3, "a"), CSV_COLUMNS, resume=False) as writer:
+        writer.write(1, row("Request Error: Timeout"))
+        writer.write(2, row("working", "a"))
+        writer.write(3, row("working", "a", p5=f"{CODE_FETCH_ERROR}: Timeout"))
+    with CheckpointWriter(shard_output(shard_dir, 1, 3, "b"), CSV_COLUMNS, resume=False) as writer:
+        writer.write(1, row("working", "b"))
+        writer.write(2, row("Request Error: Timeout"))
+        writer.write(3, row("working", "b"))
+
+    output = str(tmp_path / "merged.csv")
+    assert merge(shard_dir, output) == (3, 3)
+    merged = dict(read_rows(output, CSV_COLUMNS))
+    assert [merged[i][:2] for i in (1, 2, 3)] == [["working", "b"], ["working", "a"], ["working", "b"]]
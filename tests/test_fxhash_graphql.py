@@ -0,0 +1,58 @@
+import json
+import re
+
+from conftest import add_token
+from fxhash_graphql import BatchTokenFetcher
+
+
+# GraphQL returns metadata as a JSON string, which normalize_token has to parse
+def add_tokens(replay, ids):
+    for artwork_id in ids:
+        token = add_token(replay, artwork_id, bundle=False)
+        token["metadata"] = json.dumps(token["metadata"])
+
+
+# Makes the replay GraphQL endpoint reject any query looking up more than `limit` tokens
+def reject_batches_over(replay, limit):
+    answer = replay.graphql
+    sizes = []
+
+    def limited(body):
+        size = len(re.findall(r"generativeToken\(id:", json.loads(body)["query"]))
+        sizes.append(size)
+        if size > limit:
+            return {"errors": [{"message": "query too complex"}]}
+        return answer(body)
+
+    replay.graphql = limited
+    return sizes
+
+
+def test_batch_returns_normalized_tokens_and_unknown_ids(replay):
+    add_tokens(replay, range(1, 11))
+    tokens = BatchTokenFetcher(batch_size=50).fetch(list(range(1, 13)))
+    assert replay.take_counts()[0] == {"api.fxhash.xyz": 1}
+    assert tokens[11] is None and tokens[12] is None
+    assert tokens[3]["description"] == "Token 3"
+    assert tokens[3]["artifactUri"] == "ipfs://QmToken3/?fxhash=oo3&fxiteration=1"
+    assert tokens[3]["ipfs"] == "https://gateway.fxhash2.xyz/ipfs/QmToken3"
+    assert tokens[3]["displayUri"] == "ipfs://QmDisplay3"
+
+
+def test_rejected_batches_are_split_until_they_succeed(replay):
+    add_tokens(replay, range(1, 101))
+    sizes = reject_batches_over(replay, 12)
+    fetcher = BatchTokenFetcher(batch_size=50)
+    tokens = fetcher.fetch(list(range(1, 101)))
+
+    assert sorted(tokens) == list(range(1, 101))
+    assert all(tokens[artwork_id]["name"] == f"Token {artwork_id}" for artwork_id in tokens)
+    assert sizes[0] == 50
+    assert fetcher.batch_size <= 50
+
+
+def test_request_budget_leaves_unfetched_ids_out(replay):
+    add_tokens(replay, range(1, 31))
+    tokens = BatchTokenFetcher(batch_size=10, max_batch=10, request_budget=2).fetch(list(range(1, 31)))
+    assert sorted(tokens) == list(range(1, 21))
+    assert replay.take_counts()[0] == {"api.fxhash.xyz": 2}
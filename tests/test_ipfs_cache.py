@@ -0,0 +1,100 @@
+import asyncio
+import itertools
+
+import pytest
+
+import benchmark_suite
+import http_client
+import ipfs_cache
+from conftest import add_token
+from ipfs_cache import Download, IPFSCache
+from updatedFxhash import CSV_COLUMNS, crawl_rows
+
+ONCHFS_HASH = "a1b2c3d4e5f6"
+
+
+def read(url):
+    return b"".join(Download(url).chunks())
+
+
+def test_onchfs_content_is_fetched_once_and_cached_by_file_hash(replay):
+    benchmark_suite.add_generative_bundle(replay.store, f"onchfs://{ONCHFS_HASH}", "1.9.0", 1, runnable=True)
+    body = read(f"onchfs://{ONCHFS_HASH}/sketch.js")
+    assert replay.take_counts()[0] == {"onchfs.fxhash2.xyz": 1}
+
+    cache = ipfs_cache.get_default_cache()
+    assert cache.get(f"onchfs:{ONCHFS_HASH}", "sketch.js")[0] == body
+    # The prefix keeps onchfs hashes apart from IPFS CIDs
+    assert cache.get(ONCHFS_HASH, "sketch.js") is None
+    # The proxy URL is the same content, so it is a cache hit
+    assert read(f"https://onchfs.fxhash2.xyz/{ONCHFS_HASH}/sketch.js") == body
+    assert replay.take_counts()[0] == {}
+
+
+def test_onchfs_proxy_override_is_used(replay, monkeypatch):
+    # What ONCHFS_PROXY_URL sets up: the proxy's own base URL, with no host segment
+    monkeypatch.setitem(http_client.HOST_OVERRIDES, "onchfs.fxhash2.xyz", f"{replay.url}/proxy")
+    replay.store.add("proxy", f"/{ONCHFS_HASH}/sketch.js", "function setup(){}", content_type="application/javascript")
+    assert read(f"onchfs://{ONCHFS_HASH}/sketch.js") == b"function setup(){}"
+    assert replay.take_counts()[0] == {"proxy": 1}
+
+
+def test_onchfs_generative_uri_is_crawled(replay):
+    add_token(replay, 1, bundle=False, generativeUri=f"onchfs://{ONCHFS_HASH}")
+    benchmark_suite.add_generative_bundle(replay.store, f"onchfs://{ONCHFS_HASH}", "1.9.0", 1, runnable=True)
+
+    async def collect():
+        return [row async for _, row in crawl_rows([1])]
+
+    row = dict(zip(CSV_COLUMNS, asyncio.run(collect())[0]))
+    assert row["Link Status"] == "working"
+    assert row["IPFS Link"] == f"https://onchfs.fxhash2.xyz/{ONCHFS_HASH}"
+    assert row["p5.js Versions"] == "p5.js (version unknown)"
+    assert row["Generative URI fxhash"] == f"https://onchfs.fxhash2.xyz/{ONCHFS_HASH}"
+    assert ipfs_cache.get_default_cache().get(f"onchfs:{ONCHFS_HASH}", "") is not None
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Distinct, increasing access times however fast the test runs
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(ipfs_cache.time, "time", lambda: float(next(ticks)))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = IPFSCache(str(tmp_path / "cache.sqlite"), max_bytes=35)
+    for cid in ("QmA", "QmB", "QmC"):
+        cache.put(cid, "", b"x" * 10)
+    assert cache.get("QmA") is not None
+    cache.put("QmD", "", b"x" * 10)
+
+    assert [cid for cid in ("QmA", "QmB", "QmC", "QmD") if cache.get(cid) is not None] == ["QmA", "QmC", "QmD"]
+    assert cache.stats()["bytes"] == 30
+    cache.close()
+
+
+def test_batched_hits_survive_a_reopen(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite")
+    cache = IPFSCache(path, max_bytes=25)
+    cache.put("QmA", "", b"x" * 10)
+    cache.put("QmB", "", b"x" * 10)
+    cache.get("QmA")
+    cache.close()
+
+    cache = IPFSCache(path, max_bytes=25)
+    assert cache.stats()["bytes"] == 20
+    cache.put("QmC", "", b"x" * 10)
+    assert cache.get("QmB") is None and cache.get("QmA") is not None
+    cache.close()
+
+
+def test_hit_and_miss_counters(tmp_path):
+    cache = IPFSCache(str(tmp_path / "cache.sqlite"))
+    assert cache.get("QmA", "index.html") is None
+    cache.put("QmA", "index.html", b"<html>", "utf-8")
+    cache.put("QmA", "index.html", b"<html></html>", "utf-8")
+    assert cache.get("QmA", "index.html") == (b"<html></html>", "utf-8")
+    assert cache.get("QmA", "index.html") is not None
+    assert cache.get("QmA", "sketch.js") is None
+    assert cache.stats() == {"hits": 2, "misses": 2, "entries": 1, "bytes": 13}
+    cache.close()
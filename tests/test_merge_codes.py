@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+import merge_codes
+from conftest import add_token
+
+
+def add_tokens(replay, ids, **fields):
+    for artwork_id in ids:
+        add_token(replay, artwork_id, bundle=False, **fields)
+
+
+def test_new_tokens_are_paged_by_id_down_to_the_cursor(replay):
+    add_tokens(replay, range(1, 46))
+    # Opening dates that are missing or scheduled far ahead must not stop or skip the scan
+    add_tokens(replay, [44], mintOpensAt=None)
+    add_tokens(replay, [30], mintOpensAt="2099-01-01T00:00:00Z")
+    tokens = merge_codes.get_new_generative_tokens({"id": 10}, page_size=20)
+    assert [token["id"] for token in tokens] == list(range(45, 10, -1))
+    assert merge_codes.advance_state({"id": 10}, tokens) == {"id": 45}
+    assert merge_codes.advance_state({"id": 10}, []) == {"id": 10}
+
+
+def test_failed_page_raises_instead_of_ending_the_feed(replay):
+    add_tokens(replay, range(1, 46))
+    answer = replay.graphql
+
+    def fail_after_first_page(body):
+        if json.loads(body)["variables"]["skip"] >= 20:
+            return {"errors": [{"message": "internal error"}]}
+        return answer(body)
+
+    replay.graphql = fail_after_first_page
+    with pytest.raises(ValueError):
+        merge_codes.get_new_generative_tokens({"id": 10}, page_size=20)
+
+
+def test_old_mint_opens_at_state_is_migrated_from_the_csv(replay):
+    merge_codes.create_csv()
+    merge_codes.write_to_csv(["Success", "Token", "https://www.fxhash.xyz/generative/31002"] + ["-"] * 11)
+    with open("state.json", mode='w', encoding='utf-8') as file:
+        json.dump({"mintOpensAt": "2024-01-01T00:00:00Z", "ids": [31002]}, file)
+    assert merge_codes.load_state("state.json") == {"id": 31002}
+    merge_codes.save_state({"id": 31005}, "state.json")
+    assert merge_codes.load_state("state.json") == {"id": 31005}
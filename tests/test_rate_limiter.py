@@ -0,0 +1,91 @@
+import pytest
+import requests
+
+import http_client
+import rate_limiter
+
+PAGE_URL = "https://www.fxhash.xyz/generative/1"
+
+
+def serve(replay, status):
+    replay.store.add("www.fxhash.xyz", "/generative/1", "page", status=status)
+
+
+def open_circuit(replay):
+    serve(replay, 503)
+    limit = rate_limiter.limit_for(PAGE_URL)
+    for _ in range(rate_limiter.FAILURE_THRESHOLD):
+        with pytest.raises(requests.exceptions.HTTPError):
+            http_client.get(PAGE_URL, retries=0)
+    assert limit.breaker.state() == "open"
+    with pytest.raises(rate_limiter.CircuitOpenError):
+        http_client.get(PAGE_URL)
+    limit.breaker.reset_after = 0.0
+    return limit
+
+
+def test_retried_request_counts_as_one_failure(replay):
+    serve(replay, 500)
+    with pytest.raises(requests.exceptions.HTTPError):
+        http_client.get(PAGE_URL, retries=2)
+    assert replay.take_counts()[0] == {"www.fxhash.xyz": 3}
+    assert rate_limiter.limit_for(PAGE_URL).breaker.failures == 1
+
+
+def test_throttled_probe_resolves_the_circuit(replay):
+    limit = open_circuit(replay)
+    serve(replay, 429)
+    with pytest.raises(requests.exceptions.HTTPError):
+        http_client.get(PAGE_URL, throttle_retries=2)
+    assert limit.breaker.state() == "open"
+
+    serve(replay, 200)
+    assert http_client.get(PAGE_URL).text == "page"
+    assert limit.breaker.state() == "closed"
+
+
+def test_probe_failing_with_an_unexpected_error_resolves_the_circuit(replay, monkeypatch):
+    limit = open_circuit(replay)
+
+    def redirect_loop(*args, **kwargs):
+        raise requests.exceptions.TooManyRedirects("redirect loop")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(http_client.session, "request", redirect_loop)
+        with pytest.raises(requests.exceptions.TooManyRedirects):
+            http_client.get(PAGE_URL)
+    assert limit.breaker.state() == "open"
+
+    serve(replay, 200)
+    assert http_client.get(PAGE_URL).text == "page"
+    assert limit.breaker.state() == "closed"
+
+
+def test_not_found_does_not_count_against_the_host(replay):
+    serve(replay, 404)
+    for _ in range(rate_limiter.FAILURE_THRESHOLD + 1):
+        with pytest.raises(requests.exceptions.HTTPError):
+            http_client.get(PAGE_URL)
+    assert rate_limiter.limit_for(PAGE_URL).breaker.state() == "closed"
+
+
+def test_unlimited_hosts_wait_before_retrying_a_429(replay, monkeypatch):
+    waits = []
+    monkeypatch.setattr(http_client, "throttle_sleep", lambda retry_after, throttled: waits.append(retry_after))
+    http_client.redirect_hosts(replay.url, ["cdn.jsdelivr.net"])
+    assert rate_limiter.limit_for("https://cdn.jsdelivr.net/npm/p5") is None
+    replay.store.add("cdn.jsdelivr.net", "/npm/p5", "p5")
+    # Above one request per second the replay server answers 429 with Retry-After: 1
+    replay.max_rps = 1
+    http_client.get("https://cdn.jsdelivr.net/npm/p5")
+    with pytest.raises(requests.exceptions.HTTPError):
+        http_client.get("https://cdn.jsdelivr.net/npm/p5", throttle_retries=2)
+    assert waits == [1.0, 1.0]
+
+
+def test_throttle_sleep_backs_off_without_retry_after(monkeypatch):
+    slept = []
+    monkeypatch.setattr(http_client.time, "sleep", slept.append)
+    http_client.throttle_sleep(None, 0)
+    http_client.throttle_sleep(2.5, 3)
+    assert 0 <= slept[0] <= 0.5 and slept[1] == 2.5
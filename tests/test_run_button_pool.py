@@ -0,0 +1,28 @@
+import csv
+
+from code_for_button_check import check_run_button
+from conftest import add_token
+from run_button_pool import process_artworks_pooled
+from run_button_precheck import PRECHECK_HTML_MISSING, PRECHECK_PASS
+
+# Selenium itself needs Chrome and a chromedriver download, so these tests cover the
+# pool up to the point where it would start browsers: when the HTTP pre-check
+# decides every artwork, no driver is launched at all.
+
+
+def test_artworks_decided_by_the_precheck_never_reach_chrome(replay, monkeypatch):
+    add_token(replay, 1, "QmRuns")
+    # Token 2's bundle was never pinned, so its HTML is missing
+    add_token(replay, 2, "QmGone", bundle=False)
+
+    def no_chrome():
+        raise AssertionError("Chrome should not be needed")
+
+    monkeypatch.setattr("run_button_pool.ChromeDriverManager", no_chrome)
+    urls = ["https://www.fxhash.xyz/generative/1", "https://www.fxhash.xyz/generative/2"]
+    process_artworks_pooled(urls, check_run_button, output="results.csv")
+
+    with open("results.csv", newline='') as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == ["Artwork URL", "Status"]
+    assert dict(rows[1:]) == {urls[0]: PRECHECK_PASS, urls[1]: PRECHECK_HTML_MISSING}
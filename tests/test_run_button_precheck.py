@@ -0,0 +1,38 @@
+import benchmark_suite
+import ipfs_cache
+import run_button_precheck
+from run_button_precheck import PRECHECK_HTML_MISSING, PRECHECK_PASS, precheck_generative_uri
+
+
+def test_bundle_with_the_snippet_passes(replay):
+    benchmark_suite.add_generative_bundle(replay.store, "ipfs://QmRunnable", "1.9.0", 4, runnable=True)
+    assert precheck_generative_uri("ipfs://QmRunnable") == PRECHECK_PASS
+
+
+def test_bundle_without_the_snippet_is_escalated(replay):
+    benchmark_suite.add_generative_bundle(replay.store, "ipfs://QmStatic", "1.9.0", 4, runnable=False)
+    assert precheck_generative_uri("ipfs://QmStatic") is None
+
+
+def test_missing_html_and_missing_script_are_broken(replay):
+    assert precheck_generative_uri("ipfs://QmNowhere") == PRECHECK_HTML_MISSING
+    benchmark_suite.add_generative_bundle(replay.store, "ipfs://QmPartial", "1.9.0", 4, runnable=True)
+    for host in benchmark_suite.GATEWAY_HOSTS:
+        del replay.store.responses[replay.store.get_key(host, "/ipfs/QmPartial/p5.min.js")]
+    assert precheck_generative_uri("ipfs://QmPartial") == run_button_precheck.PRECHECK_SCRIPT_MISSING.format(
+        "./p5.min.js")
+
+
+def test_marker_split_across_chunks_is_found(replay):
+    script = b"/" * (ipfs_cache.CHUNK_SIZE - 3) + b"fxrand()"
+    for host in benchmark_suite.GATEWAY_HOSTS:
+        replay.store.add(host, "/ipfs/QmSplit/sketch.js", script, content_type="application/javascript")
+    assert run_button_precheck.script_has_snippet("https://gateway.fxhash2.xyz/ipfs/QmSplit/sketch.js")
+
+
+def test_large_bundles_stop_at_the_byte_cap(replay, monkeypatch):
+    monkeypatch.setattr(ipfs_cache, "MAX_FETCH_BYTES", ipfs_cache.CHUNK_SIZE)
+    script = b"/" * (4 * ipfs_cache.CHUNK_SIZE) + b"fxrand()"
+    for host in benchmark_suite.GATEWAY_HOSTS:
+        replay.store.add(host, "/ipfs/QmHuge/lib.js", script, content_type="application/javascript")
+    assert not run_button_precheck.script_has_snippet("https://gateway.fxhash2.xyz/ipfs/QmHuge/lib.js")
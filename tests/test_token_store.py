@@ -0,0 +1,59 @@
+import csv
+
+from crawl_checkpoint import CheckpointWriter
+from token_store import TokenStore
+from updatedFxhash import CSV_COLUMNS
+
+
+def analysis_row(p5="-", others="No other libraries found", description="-", status="working"):
+    row = dict.fromkeys(CSV_COLUMNS, "-")
+    row.update({"Link Status": status, "Description": description, "p5.js Versions": p5, "Other JS Libraries": others})
+    return [row[column] for column in CSV_COLUMNS]
+
+
+def write_analysis(path, rows):
+    with CheckpointWriter(path, CSV_COLUMNS, resume=False) as writer:
+        for token_id, row in rows.items():
+            writer.write(token_id, row)
+
+
+def write_run_checks(path, statuses):
+    with open(path, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(["Artwork URL", "Status"])
+        for token_id, status in statuses.items():
+            writer.writerow([f"https://www.fxhash.xyz/generative/{token_id}", status])
+
+
+def test_reimport_updates_rows_in_place(tmp_path):
+    store = TokenStore(str(tmp_path / "store.sqlite"))
+    write_analysis(str(tmp_path / "a.csv"), {1: analysis_row("1.4.0", "three.js 150", "First")})
+    store.import_analysis(str(tmp_path / "a.csv"))
+    # The re-crawl lost the description and found another p5 build
+    write_analysis(str(tmp_path / "a.csv"), {1: analysis_row("1.9.0", "No other libraries found")})
+    store.import_analysis(str(tmp_path / "a.csv"))
+
+    assert store.stats() == {"tokens": 1, "fetch_results": 1, "libraries": 1, "run_checks": 0}
+    assert store.db.execute("SELECT description FROM tokens WHERE token_id = 1").fetchone() == ("First",)
+    assert store.db.execute("SELECT library, version FROM libraries").fetchall() == [("p5.js", "1.9.0")]
+    store.close()
+
+
+def test_library_query_by_version_prefix_and_failed_run(tmp_path):
+    store = TokenStore(str(tmp_path / "store.sqlite"))
+    write_analysis(str(tmp_path / "a.csv"), {
+        1: analysis_row("1.4.0"), 2: analysis_row("1.4.2"), 3: analysis_row("1.4.0"),
+        4: analysis_row("1.9.0"), 5: analysis_row("1.40.0"), 6: analysis_row("1.4.1"),
+    })
+    store.import_analysis(str(tmp_path / "a.csv"))
+    write_run_checks(str(tmp_path / "run.csv"), {
+        1: "Run button works", 2: "Broken - script not found: ./p5.min.js", 3: "Run button works (HTTP pre-check)",
+        4: "Run button not found", 5: "Run button not found",
+    })
+    store.import_run_checks(str(tmp_path / "run.csv"))
+
+    # Token 6 was never checked, token 5's 1.40 is not a 1.4.x
+    assert [row[0] for row in store.tokens_with_library("p5.js", version="1.4", run_passed=False)] == [2]
+    assert [row[0] for row in store.tokens_with_library("p5.js", version="1.4", run_passed=True)] == [1, 3]
+    assert [row[0] for row in store.tokens_with_library("p5.js", version="1.4")] == [1, 2, 3, 6]
+    store.close()
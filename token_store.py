@@ -0,0 +1,263 @@
+# Normalized SQLite store for everything the scripts find out about a token.
+# Tokens are keyed by ID; crawl results (from the analysis crawl and from the
+# merge_codes feed), the libraries detected in each and the Run-button status
+# hang off that ID in their own indexed tables. Every import is an upsert, so a
+# re-crawl updates rows in place, and lookups such as "p5.js 1.4.x tokens that
+# failed the Run check" are index queries instead of reloading CSVs into pandas.
+#
+#   python token_store.py import --analysis fxhash_artwork_analysis.csv --feed fxhash_data.csv \
+#       --button artwork_button_check_results.csv play_button_check_results.csv
+#   python token_store.py query --library p5.js --version 1.4 --run-failed
+
+import argparse
+import csv
+import re
+import sqlite3
+import time
+
+from crawl_checkpoint import read_rows
+from updatedFxhash import CODE_FETCH_ERROR, CSV_COLUMNS, artwork_id_from_url
+
+STORE_PATH = "fxhash_tokens.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tokens (
+    token_id INTEGER PRIMARY KEY,
+    name TEXT,
+    description TEXT,
+    ipfs_link TEXT,
+    generative_uri TEXT,
+    artifact_uri TEXT,
+    display_uri TEXT,
+    thumbnail_uri TEXT,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fetch_results (
+    token_id INTEGER NOT NULL REFERENCES tokens (token_id),
+    source TEXT NOT NULL,
+    link_status TEXT NOT NULL,
+    ok INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (token_id, source)
+);
+CREATE TABLE IF NOT EXISTS libraries (
+    token_id INTEGER NOT NULL REFERENCES tokens (token_id),
+    source TEXT NOT NULL,
+    library TEXT NOT NULL,
+    version TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (token_id, source, library, version)
+);
+CREATE TABLE IF NOT EXISTS run_checks (
+    token_id INTEGER PRIMARY KEY REFERENCES tokens (token_id),
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    passed INTEGER NOT NULL,
+    checked_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS libraries_by_version ON libraries (library, version, token_id);
+CREATE INDEX IF NOT EXISTS fetch_results_by_status ON fetch_results (ok, source);
+CREATE INDEX IF NOT EXISTS run_checks_by_result ON run_checks (passed, token_id);
+"""
+
+# Placeholder values the CSVs use for "nothing here"
+EMPTY_VALUES = {"", "-", "N/A", "None", "No p5.js found", "No other libraries found"}
+
+# Statuses (from both checkers and the HTTP pre-check) that mean the Run button works
+RUN_PASSED = re.compile(r"^Run button works")
+
+VERSION = re.compile(r"^v?(\d+(?:\.\d+)*)$")
+
+
+# Function to turn a CSV placeholder into None
+def clean(value):
+    return None if value is None or value.strip() in EMPTY_VALUES else value
+
+
+# Function to split the p5.js column into versions ("1.4.0 / 1.9.0", legacy "v1.9.0")
+def parse_p5_versions(value):
+    versions = []
+    for part in re.split(r"\s+/\s+", value or ""):
+        part = part.strip()
+        if clean(part) is None:
+            continue
+        match = VERSION.match(part)
+        versions.append(("p5.js", match.group(1) if match else ""))
+    return versions
+
+
+# Function to split the other-libraries column into (library, version) pairs
+# Handles the scanner summary ("three.js 150 / https://...js") and the older
+# comma-separated script lists written by merge_codes
+def parse_other_libraries(value):
+    libraries = []
+    for part in re.split(r"\s+/\s+|,\s*", value or ""):
+        part = part.strip()
+        if clean(part) is None:
+            continue
+        if "://" not in part and " " in part:
+            library, version = part.rsplit(" ", 1)
+            libraries.append((library, version))
+        else:
+            libraries.append((part, ""))
+    return libraries
+
+
+class TokenStore:
+    def __init__(self, path=STORE_PATH):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    # Function to insert or update a token; values given as None keep what is stored
+    def upsert_token(self, token_id, **fields):
+        fields = {key: clean(value) for key, value in fields.items()}
+        columns = ["token_id", "updated"] + list(fields)
+        self.db.execute(
+            f"INSERT INTO tokens ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT (token_id) DO UPDATE SET updated = excluded.updated"
+            + "".join(f", {key} = COALESCE(excluded.{key}, {key})" for key in fields),
+            [token_id, time.time()] + list(fields.values()),
+        )
+
+    # Function to record a crawl result and replace the libraries found by that source
+    def upsert_fetch(self, token_id, source, link_status, ok, libraries):
+        now = time.time()
+        self.db.execute(
+            "INSERT INTO fetch_results (token_id, source, link_status, ok, fetched_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (token_id, source) DO UPDATE SET link_status = excluded.link_status, "
+            "ok = excluded.ok, fetched_at = excluded.fetched_at",
+            (token_id, source, link_status, int(ok), now),
+        )
+        self.db.execute("DELETE FROM libraries WHERE token_id = ? AND source = ?", (token_id, source))
+        self.db.executemany(
+            "INSERT OR IGNORE INTO libraries (token_id, source, library, version) VALUES (?, ?, ?, ?)",
+            [(token_id, source, library, version) for library, version in libraries],
+        )
+
+    # Function to record a Run-button check result
+    def upsert_run_check(self, token_id, url, status):
+        self.upsert_token(token_id)
+        self.db.execute(
+            "INSERT INTO run_checks (token_id, url, status, passed, checked_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (token_id) DO UPDATE SET url = excluded.url, status = excluded.status, "
+            "passed = excluded.passed, checked_at = excluded.checked_at",
+            (token_id, url, status, int(bool(RUN_PASSED.match(status))), time.time()),
+        )
+
+    # Function to import an analysis CSV (fxhash_artwork_analysis.csv schema)
+    # IDs come from the checkpoint manifest, or count up from start_id if there is none
+    def import_analysis(self, path, start_id=30661):
+        count = 0
+        for token_id, values in read_rows(path, CSV_COLUMNS, start_id):
+            row = dict(zip(CSV_COLUMNS, values))
+            self.upsert_token(
+                token_id, description=row["Description"], ipfs_link=row["IPFS Link"],
+                generative_uri=row["Generative URI fxhash"], artifact_uri=row["Artifact URI fxhash"],
+                display_uri=row["Display URI fxhash"], thumbnail_uri=row["Thumbnail URI fxhash"],
+            )
+            # A working page whose code could not be fetched tells nothing about its libraries
+            code_fetched = not row["p5.js Versions"].startswith(CODE_FETCH_ERROR)
+            libraries = parse_p5_versions(row["p5.js Versions"]) + parse_other_libraries(row["Other JS Libraries"])
+            self.upsert_fetch(token_id, "analysis", row["Link Status"], row["Link Status"] == "working" and code_fetched,
+                              libraries if code_fetched else [])
+            count += 1
+        self.db.commit()
+        return count
+
+    # Function to import the merge_codes feed CSV (fxhash_data.csv schema)
+    def import_feed(self, path):
+        count = 0
+        with open(path, newline='', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                token_id = artwork_id_from_url(row["Artwork Link"])
+                if token_id is None:
+                    continue
+                self.upsert_token(token_id, name=row["Description"], generative_uri=row["IPFS Link"])
+                libraries = parse_p5_versions(row["p5.js Versions"]) + parse_other_libraries(row["Other JS Libraries"])
+                self.upsert_fetch(token_id, "feed", row["Link Status"], row["Link Status"] == "Success", libraries)
+                count += 1
+        self.db.commit()
+        return count
+
+    # Function to import a Run-button results CSV (Artwork URL, Status)
+    def import_run_checks(self, path):
+        count = 0
+        with open(path, newline='', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                token_id = artwork_id_from_url(row["Artwork URL"])
+                if token_id is None:
+                    continue
+                self.upsert_run_check(token_id, row["Artwork URL"], row["Status"])
+                count += 1
+        self.db.commit()
+        return count
+
+    # Function to find tokens using a library, optionally by version prefix and Run-check outcome
+    # version "1.4" matches 1.4 and 1.4.x; run_passed None ignores the Run check,
+    # False means checked and failed, True means checked and passed
+    def tokens_with_library(self, library, version=None, run_passed=None):
+        query = (
+            "SELECT DISTINCT t.token_id, t.name, l.version, r.status FROM libraries l "
+            "JOIN tokens t ON t.token_id = l.token_id "
+            "LEFT JOIN run_checks r ON r.token_id = l.token_id WHERE l.library = ?"
+        )
+        params = [library]
+        if version:
+            query += " AND (l.version = ? OR l.version GLOB ?)"
+            params += [version, version + ".*"]
+        if run_passed is not None:
+            query += " AND r.passed = ?"
+            params.append(int(run_passed))
+        return self.db.execute(query + " ORDER BY t.token_id", params).fetchall()
+
+    # Function to count rows per table
+    def stats(self):
+        return {
+            table: self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("tokens", "fetch_results", "libraries", "run_checks")
+        }
+
+    def close(self):
+        self.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Normalized SQLite store for fxhash token analysis")
+    parser.add_argument("--store", default=STORE_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="upsert CSV results into the store")
+    importer.add_argument("--analysis", nargs="*", default=[], help="CSVs in the fxhash_artwork_analysis.csv schema")
+    importer.add_argument("--start-id", type=int, default=30661, help="first ID of an analysis CSV without a manifest")
+    importer.add_argument("--feed", nargs="*", default=[], help="CSVs in the fxhash_data.csv schema")
+    importer.add_argument("--button", nargs="*", default=[], help="Run-button check CSVs")
+
+    query = commands.add_parser("query", help="list tokens using a library")
+    query.add_argument("--library", default="p5.js")
+    query.add_argument("--version", help="version or version prefix, e.g. 1.4")
+    outcome = query.add_mutually_exclusive_group()
+    outcome.add_argument("--run-failed", action="store_const", const=False, dest="run_passed")
+    outcome.add_argument("--run-passed", action="store_const", const=True, dest="run_passed")
+    args = parser.parse_args()
+
+    store = TokenStore(args.store)
+    if args.command == "import":
+        for path in args.analysis:
+            print(f"{path}: {store.import_analysis(path, args.start_id)} rows")
+        for path in args.feed:
+            print(f"{path}: {store.import_feed(path)} rows")
+        for path in args.button:
+            print(f"{path}: {store.import_run_checks(path)} rows")
+        print(store.stats())
+    elif args.command == "query":
+        started = time.perf_counter()
+        rows = store.tokens_with_library(args.library, args.version, args.run_passed)
+        elapsed = time.perf_counter() - started
+        for token_id, name, version, status in rows:
+            print(f"{token_id:8d}  {version or '-':10} {status or 'not checked':40} {name or ''}")
+        print(f"{len(rows)} tokens in {elapsed * 1000:.1f} ms")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
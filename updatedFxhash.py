@@ -1,13 +1,62 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
+from lxml import etree
+from ipfs_cache import ONCHFS, Download, get_default_cache
+from crawl_checkpoint import CheckpointWriter
+from library_detector import LibraryScanner
+from fxhash_graphql import BatchTokenFetcher
+from crawl_metrics import annotate, traced, tracer
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlparse
+from itertools import islice
+import argparse
+import asyncio
+import http_client
+import ipfs_cache
+import multiprocessing
+import rate_limiter
+import os
 import requests
-import pandas as pd
 import re
 import time
 
+# Columns of fxhash_artwork_analysis.csv, in the order analyze_artwork returns them
+CSV_COLUMNS = [
+    "Link Status", "Description", "IPFS Link", "p5.js Versions", "Other JS Libraries",
+    "Artifact URI HTTP", "Artifact URI fxhash", "Display URI HTTP",
+    "Display URI fxhash", "Thumbnail URI HTTP", "Thumbnail URI fxhash",
+    "Generative URI HTTP", "Generative URI fxhash"
+]
+
+ARTWORK_URL = "https://www.fxhash.xyz/generative/{}"
+API_URL = "https://api.fxhash.xyz/v1/tokens/{}"
+
+# Maximum number of in-flight requests per host for the async crawl
+# Slots are taken by the host of the URL being fetched, and IPFS links always
+# point at gateway.fxhash2.xyz, so its entry is one shared limit for all IPFS
+# fetches, including those http_client fails over to another gateway (whose
+# request rate rate_limiter still paces per gateway actually contacted)
+HOST_CONCURRENCY = {
+    "api.fxhash.xyz": 8,
+    "www.fxhash.xyz": 2,
+    "gateway.fxhash2.xyz": 4,
+    "onchfs.fxhash2.xyz": 4,
+}
+DEFAULT_HOST_CONCURRENCY = 4
+
+# Marks an ID the GraphQL batch lookup returned no token for
+MISSING_TOKEN = object()
+
+# Worker processes for the CPU-bound HTML parsing stage
+DEFAULT_PARSE_WORKERS = os.cpu_count() or 1
+
+# Maximum number of artworks analyzed at once; bounds memory for large ranges
+DEFAULT_CRAWL_WINDOW = 64
+
+# Function to get the artwork ID at the end of an fxhash.xyz/generative/<id> URL
+def artwork_id_from_url(artwork_url):
+    match = re.search(r"/generative/(\d+)", artwork_url or "")
+    return int(match.group(1)) if match else None
+
 # Function to convert IPFS links to HTTP format
 def ipfs_to_http(ipfs_link):
     if ipfs_link.startswith("ipfs://"):
@@ -16,156 +65,295 @@ def ipfs_to_http(ipfs_link):
             f"https://gateway.ipfs.io/ipfs/{ipfs_link[7:]}",
             f"https://gateway.fxhash2.xyz/ipfs/{ipfs_link[7:]}"
         )
+    if ipfs_link.startswith("onchfs://"):
+        # onchfs content is only served by the fxhash proxy
+        http_link = ONCHFS.gateway_url(ipfs_link)
+        return http_link, http_link
     return ipfs_link, ipfs_link
 
 # Function to fetch data from the fxhash public API
+@traced("fetch_artwork_from_api")
 def fetch_artwork_from_api(artwork_id):
-    api_url = f"https://api.fxhash.xyz/v1/tokens/{artwork_id}"
+    api_url = API_URL.format(artwork_id)
     try:
-        response = requests.get(api_url, timeout=5)
-        response.raise_for_status()
+        response = http_client.get(api_url, timeout=5)
+        annotate(bytes=len(response.content))
         return response.json()
     except requests.exceptions.RequestException as e:
+        annotate(status=f"error: {e.__class__.__name__}")
         return f"API Error: {str(e)}"
 
-# Function to fetch code from the IPFS link
-def fetch_ipfs_code(ipfs_link):
+# Library columns for content that is not code at all
+NO_LIBRARIES = ("No p5.js found", "No other libraries found")
+
+# Prefix of both library columns when the code could not be fetched; the row is
+# still "working", so crawl_diff looks for this to retry it
+CODE_FETCH_ERROR = "Code Fetch Error"
+
+# Function to stream code from the IPFS link and detect its libraries chunk by chunk
+# Only one chunk is held at a time, however large the bundle; the download stops
+# at ipfs_cache.MAX_FETCH_BYTES and binary content is skipped
+@traced("fetch_ipfs_code")
+def fetch_ipfs_libraries(ipfs_link):
+    scanner = LibraryScanner()
+    download = Download(ipfs_link, timeout=5)
     try:
-        code_response = requests.get(ipfs_link, timeout=5)
-        code_response.raise_for_status()
-        return code_response.text
+        for chunk in download.chunks():
+            scanner.feed(chunk)
     except requests.exceptions.RequestException as e:
-        return f"IPFS Error: {str(e)}"
+        annotate(status=f"error: {e.__class__.__name__}")
+        error = f"{CODE_FETCH_ERROR}: {e.__class__.__name__}"
+        return error, error
+    annotate(bytes=download.size)
+    if download.binary:
+        return NO_LIBRARIES
+    scanner.close()
+    return scanner.summary()
+
+# URI fields embedded in the page's JSON data script
+URI_TYPES = ('artifactUri', 'displayUri', 'thumbnailUri', 'generativeUri')
+URI_PATTERN = re.compile(r'"(' + '|'.join(URI_TYPES) + r')":"((?:ipfs|onchfs)://[^"]+)"')
+
+# Function to extract every URI type in one pass over the page's inline scripts
+def extract_uris(document):
+    uris = {}
+    for script_text in document.xpath('//script[not(@src)]/text()'):
+        for match in URI_PATTERN.finditer(script_text):
+            uris.setdefault(match.group(1), match.group(2))
+        if len(uris) == len(URI_TYPES):
+            break
+    return {uri_type: uris.get(uri_type, "-") for uri_type in URI_TYPES}
+
+# Function to fetch the raw HTML of an fxhash artwork page
+@traced("fetch_artwork_page")
+def fetch_artwork_page(url):
+    page_content = http_client.get(url, timeout=5).content
+    annotate(bytes=len(page_content))
+    return page_content
+
+# Function to extract description, IPFS link and URIs from an fxhash artwork page
+# CPU-bound; the async crawl runs it in a process pool
+def parse_artwork_page(page_content):
+    # fxhash pages are served as UTF-8; lxml would otherwise guess latin-1 for raw bytes
+    if isinstance(page_content, bytes):
+        page_content = page_content.decode('utf-8', errors='replace')
+    document = etree.HTML(page_content)
+    if document is None:
+        return "-", "-", {uri_type: "-" for uri_type in URI_TYPES}
+
+    # Extract description and IPFS link
+    library_description = document.xpath(
+        '//div[@class="Clamp_container__xOFme GenerativeDisplay_description__NweHb"]'
+    )
+    description_text = " ".join(library_description[0].itertext()).strip() if library_description else "-"
+
+    ipfs_links = document.xpath('//a[contains(@href, "ipfs")]/@href')
+    ipfs_link = ipfs_links[0].split(',')[0].strip() if ipfs_links else "-"
+
+    # Extract additional URIs
+    return description_text, ipfs_link, extract_uris(document)
 
-# Function to extract JavaScript libraries from code content
-def extract_libraries(code_content):
-    if not code_content or "Error" in code_content:
-        return "No p5.js found", "No other libraries found"
+# Function to build the CSV row for an artwork from its metadata and detected libraries
+def build_result(description_text, ipfs_link, libraries, uris):
+    p5_version_summary, other_libraries = libraries
 
-    p5_versions = re.findall(r'(p5(\.min)?\.js)[^\s]*', code_content)
-    version_numbers = re.findall(r'(v?\d+\.\d+\.\d+|p5@\d+\.\d+\.\d+)', code_content)
-    js_libraries = re.findall(r'(https?://[^"\'\s]+\.js)', code_content)
+    # Convert IPFS URIs to HTTP format
+    artifact_uri_http, artifact_uri_fxhash = ipfs_to_http(uris.get('artifactUri', '-'))
+    display_uri_http, display_uri_fxhash = ipfs_to_http(uris.get('displayUri', '-'))
+    thumbnail_uri_http, thumbnail_uri_fxhash = ipfs_to_http(uris.get('thumbnailUri', '-'))
+    generative_uri_http, generative_uri_fxhash = ipfs_to_http(uris.get('generativeUri', '-'))
 
-    p5_version_summary = " / ".join(set(version_numbers)) if version_numbers else "No p5.js found"
-    other_libraries_summary = " / ".join(set(js_libraries)) if js_libraries else "No other libraries found"
+    return ("working", description_text, ipfs_link, p5_version_summary, other_libraries,
+            artifact_uri_http, artifact_uri_fxhash,
+            display_uri_http, display_uri_fxhash,
+            thumbnail_uri_http, thumbnail_uri_fxhash,
+            generative_uri_http, generative_uri_fxhash)
 
-    return p5_version_summary, other_libraries_summary
+# Function to pick the URIs of interest out of an API token
+def token_uris(token):
+    return {key: token.get(key, '-') for key in URI_TYPES}
 
-# Function to extract specific URI data from the soup
-def extract_uri_data(soup, uri_type):
-    script_tag = soup.find('script', string=lambda x: x and uri_type in x)
-    if script_tag:
-        match = re.search(rf'"{uri_type}":"(ipfs://[^"]+)"', script_tag.string)
-        return match.group(1) if match else "-"
-    return "-"
+# Function to build the row returned when an artwork page cannot be fetched
+def request_error_result(error):
+    return (f"Request Error: {str(error)}",) + ("-",) * (len(CSV_COLUMNS) - 1)
 
 # Main analysis function for an artwork
 def analyze_artwork(url, artwork_id):
     # Try fetching from the API
     api_data = fetch_artwork_from_api(artwork_id)
-    
+
     if isinstance(api_data, dict) and 'token' in api_data:
         token = api_data['token']
-        description_text = token.get('description', '-')
         ipfs_link = token.get('ipfs', '-')
 
         # Fetch code from IPFS
-        code_content = fetch_ipfs_code(ipfs_link)
+        libraries = fetch_ipfs_libraries(ipfs_link)
+        return build_result(token.get('description', '-'), ipfs_link, libraries, token_uris(token))
+
+    # If API data not available, fallback to web scraping
+    try:
+        description_text, ipfs_link, uris = parse_artwork_page(fetch_artwork_page(url))
+    except requests.exceptions.RequestException as e:
+        return request_error_result(e)
+
+    # Fetch code from IPFS
+    libraries = fetch_ipfs_libraries(ipfs_link)
+    return build_result(description_text, ipfs_link, libraries, uris)
+
+# Limits how many blocking requests run at once against each host
+class HostLimiter:
+    def __init__(self, limits=None, default=DEFAULT_HOST_CONCURRENCY):
+        self.limits = dict(HOST_CONCURRENCY if limits is None else limits)
+        self.default = default
+        self.semaphores = {}
+
+    # Function to get the semaphore guarding the host of a URL
+    def semaphore_for(self, url):
+        host = urlparse(url).hostname or ""
+        if host not in self.semaphores:
+            self.semaphores[host] = asyncio.Semaphore(self.limits.get(host, self.default))
+        return self.semaphores[host]
 
-        # Extract libraries
-        p5_version_summary, other_libraries = extract_libraries(code_content)
+    # Function to run a blocking fetch in a worker thread once its host has a free slot
+    async def run(self, url, func, *args):
+        async with self.semaphore_for(url):
+            return await asyncio.to_thread(func, *args)
 
-        # Extract additional URIs
-        artifact_uri = token.get('artifactUri', '-')
-        display_uri = token.get('displayUri', '-')
-        thumbnail_uri = token.get('thumbnailUri', '-')
-        generative_uri = token.get('generativeUri', '-')
+    # Upper bound on the number of fetches that can be in flight at once
+    def max_workers(self):
+        return sum(self.limits.values()) + self.default
 
-        # Convert IPFS URIs to HTTP format
-        artifact_uri_http, artifact_uri_fxhash = ipfs_to_http(artifact_uri)
-        display_uri_http, display_uri_fxhash = ipfs_to_http(display_uri)
-        thumbnail_uri_http, thumbnail_uri_fxhash = ipfs_to_http(thumbnail_uri)
-        generative_uri_http, generative_uri_fxhash = ipfs_to_http(generative_uri)
+# Async counterpart of analyze_artwork, with every fetch bounded by its host limit
+# A prefetched GraphQL token skips the REST call; MISSING_TOKEN means the batch
+# lookup found no such token, so the REST call is skipped as well
+# HTML parsing runs in `parse_pool` when given, so it never blocks the event loop
+async def analyze_artwork_async(url, artwork_id, limiter, prefetched=None, parse_pool=None):
+    print(f"Analyzing Artwork ID: {artwork_id} URL: {url}")
+    if prefetched is MISSING_TOKEN:
+        api_data = None
+    elif prefetched is not None:
+        api_data = {'token': prefetched}
+    else:
+        api_data = await limiter.run(API_URL.format(artwork_id), fetch_artwork_from_api, artwork_id)
 
-        return ("working", description_text, ipfs_link, p5_version_summary, other_libraries,
-                artifact_uri_http, artifact_uri_fxhash,
-                display_uri_http, display_uri_fxhash,
-                thumbnail_uri_http, thumbnail_uri_fxhash,
-                generative_uri_http, generative_uri_fxhash)
+    if isinstance(api_data, dict) and 'token' in api_data:
+        token = api_data['token']
+        ipfs_link = token.get('ipfs', '-')
+        libraries = await limiter.run(ipfs_link, fetch_ipfs_libraries, ipfs_link)
+        return build_result(token.get('description', '-'), ipfs_link, libraries, token_uris(token))
 
     # If API data not available, fallback to web scraping
     try:
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
+        page_content = await limiter.run(url, fetch_artwork_page, url)
+    except requests.exceptions.RequestException as e:
+        return request_error_result(e)
 
-        # Extract description and IPFS link
-        library_description = soup.find('div', class_="Clamp_container__xOFme GenerativeDisplay_description__NweHb")
-        description_text = library_description.get_text(separator=" ").strip() if library_description else "-"
-        
-        ipfs_link_tag = soup.find('a', href=lambda x: x and 'ipfs' in x)
-        ipfs_link = ipfs_link_tag['href'].split(',')[0].strip() if ipfs_link_tag else "-"
+    with tracer.span("parse_artwork_page", bytes=len(page_content)):
+        if parse_pool is None:
+            description_text, ipfs_link, uris = parse_artwork_page(page_content)
+        else:
+            loop = asyncio.get_running_loop()
+            description_text, ipfs_link, uris = await loop.run_in_executor(
+                parse_pool, parse_artwork_page, page_content
+            )
+    libraries = await limiter.run(ipfs_link, fetch_ipfs_libraries, ipfs_link)
+    return build_result(description_text, ipfs_link, libraries, uris)
 
-        # Fetch code from IPFS
-        code_content = fetch_ipfs_code(ipfs_link)
+# Function to analyze artwork IDs concurrently, yielding (id, row) pairs in ID order
+# At most `window` artworks are in flight, so memory stays flat for any range size.
+# Token metadata is prefetched in GraphQL batches, one round-trip per batch, and
+# fallback pages are parsed in a process pool while fetching carries on.
+async def crawl_rows(artwork_ids, limiter=None, window=DEFAULT_CRAWL_WINDOW, fetcher=None,
+                     parse_workers=DEFAULT_PARSE_WORKERS):
+    limiter = limiter or HostLimiter()
+    fetcher = fetcher or BatchTokenFetcher()
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=limiter.max_workers()))
+    # spawn rather than fork: the fetch threads are already running at this point
+    parse_pool = ProcessPoolExecutor(max_workers=parse_workers, mp_context=multiprocessing.get_context("spawn"))
 
-        # Extract libraries
-        p5_version_summary, other_libraries = extract_libraries(code_content)
+    artwork_ids = iter(artwork_ids)
+    pending = deque()
+    batch = deque()
+    batch_future = None
 
-        # Extract additional URIs
-        artifact_uri = extract_uri_data(soup, 'artifactUri')
-        display_uri = extract_uri_data(soup, 'displayUri')
-        thumbnail_uri = extract_uri_data(soup, 'thumbnailUri')
-        generative_uri = extract_uri_data(soup, 'generativeUri')
+    async def analyze(artwork_id, batch_future):
+        tokens = await batch_future
+        prefetched = (tokens[artwork_id] or MISSING_TOKEN) if artwork_id in tokens else None
+        return await analyze_artwork_async(ARTWORK_URL.format(artwork_id), artwork_id, limiter, prefetched,
+                                           parse_pool)
 
-        # Convert IPFS URIs to HTTP format
-        artifact_uri_http, artifact_uri_fxhash = ipfs_to_http(artifact_uri)
-        display_uri_http, display_uri_fxhash = ipfs_to_http(display_uri)
-        thumbnail_uri_http, thumbnail_uri_fxhash = ipfs_to_http(thumbnail_uri)
-        generative_uri_http, generative_uri_fxhash = ipfs_to_http(generative_uri)
+    def schedule():
+        nonlocal batch_future
+        if not batch:
+            batch.extend(islice(artwork_ids, fetcher.batch_size))
+            if not batch:
+                return
+            batch_future = asyncio.ensure_future(limiter.run(fetcher.url, fetcher.fetch, list(batch)))
+        artwork_id = batch.popleft()
+        pending.append((artwork_id, asyncio.ensure_future(analyze(artwork_id, batch_future))))
 
-        return ("working", description_text, ipfs_link, p5_version_summary, other_libraries,
-                artifact_uri_http, artifact_uri_fxhash,
-                display_uri_http, display_uri_fxhash,
-                thumbnail_uri_http, thumbnail_uri_fxhash,
-                generative_uri_http, generative_uri_fxhash)
+    try:
+        for _ in range(window):
+            schedule()
+        while pending:
+            artwork_id, task = pending.popleft()
+            result = await task
+            schedule()
+            yield artwork_id, result
+    finally:
+        parse_pool.shutdown(cancel_futures=True)
 
-    except requests.exceptions.RequestException as e:
-        return (f"Request Error: {str(e)}", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-", "-")
+# Function to stream a crawl into a checkpointed CSV, skipping IDs finished by earlier runs
+async def crawl_to_csv(start_id, end_id, writer, limiter=None):
+    artwork_ids = (i for i in range(start_id, end_id + 1) if not writer.is_done(i))
+    async for artwork_id, row in crawl_rows(artwork_ids, limiter):
+        writer.write(artwork_id, row)
+        tracer.maybe_report()
 
 # Main function
 def main():
-    start_id = 30661
-    end_id = 31600
-    artwork_links = [f"https://www.fxhash.xyz/generative/{artwork_id}" for artwork_id in range(start_id, end_id + 1)]
-    
-    # Set up the Chrome driver
-    options = Options()
-    options.add_argument("--start-maximized")
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-
-    # Data containers
-    results = []
-
-    # Analyze each artwork
-    for artwork_id, artwork_url in enumerate(artwork_links, start=start_id):
-        print(f"Analyzing Artwork ID: {artwork_id} URL: {artwork_url}")
-        result = analyze_artwork(artwork_url, artwork_id)
-        results.append(result)
-
-    # Create a DataFrame for the results
-    df = pd.DataFrame(results, columns=[
-        "Link Status", "Description", "IPFS Link", "p5.js Versions", "Other JS Libraries",
-        "Artifact URI HTTP", "Artifact URI fxhash", "Display URI HTTP",
-        "Display URI fxhash", "Thumbnail URI HTTP", "Thumbnail URI fxhash",
-        "Generative URI HTTP", "Generative URI fxhash"
-    ])
-
-    # Save to CSV
-    df.to_csv('fxhash_artwork_analysis.csv', index=False)
-
-    # Close the browser
-    driver.quit()
+    parser = argparse.ArgumentParser(description="Analyze a range of fxhash generative artworks")
+    parser.add_argument("--start-id", type=int, default=30661)
+    parser.add_argument("--end-id", type=int, default=31600)
+    parser.add_argument("--output", default="fxhash_artwork_analysis.csv")
+    parser.add_argument("--fresh", action="store_true", help="ignore the checkpoint and start over")
+    parser.add_argument("--parquet", metavar="DIR", help="also write a partitioned Parquet dataset (needs pyarrow)")
+    parser.add_argument("--trace", default="fxhash_trace.json", help="where to write the JSON-lines timing trace")
+    parser.add_argument("--store", metavar="DB", help="also upsert the results into a token_store SQLite file")
+    parser.add_argument("--max-bytes", type=int, default=ipfs_cache.MAX_FETCH_BYTES,
+                        help="stop reading a generative bundle after this many bytes")
+    parser.add_argument("--diff", action="store_true",
+                        help="re-analyze only tokens that are new, errored or whose CIDs changed since the last output")
+    parser.add_argument("--previous-start-id", type=int, default=30661,
+                        help="first ID of an existing output that has no checkpoint manifest (for --diff)")
+    args = parser.parse_args()
+    ipfs_cache.MAX_FETCH_BYTES = args.max_bytes
+    tracer.stream_to(args.trace)
+
+    if args.diff:
+        from crawl_diff import diff_crawl, print_report
+        counts = asyncio.run(diff_crawl(args.start_id, args.end_id, args.output,
+                                        previous_start_id=args.previous_start_id))
+        print_report(counts, args.output)
+    else:
+        # Analyze each artwork, appending rows to the CSV as they finish
+        with CheckpointWriter(args.output, CSV_COLUMNS, resume=not args.fresh) as writer:
+            if writer.completed:
+                print(f"Resuming: {len(writer.completed)} artworks already done")
+            asyncio.run(crawl_to_csv(args.start_id, args.end_id, writer))
+    if args.parquet:
+        from columnar_output import csv_to_parquet
+        csv_to_parquet(args.output, args.parquet)
+    if args.store:
+        from token_store import TokenStore
+        store = TokenStore(args.store)
+        print(f"Token store: {store.import_analysis(args.output, args.start_id)} rows upserted, {store.stats()}")
+        store.close()
+    print(f"IPFS cache: {get_default_cache().stats()}")
+    print(f"Rate limits: {rate_limiter.stats()}")
+    tracer.print_summary()
+    tracer.write_json(args.trace)
 
 if __name__ == "__main__":
     main()